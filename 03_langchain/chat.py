@@ -1,47 +1,138 @@
 # Chat with a vector store
+#
+# RETRIEVAL_MODE=multi: the question is rephrased a few times by the LLM and all
+# phrasings are searched (the original one right away, the rest as soon as the
+# rephrasings arrive); the ranked lists are merged with reciprocal-rank fusion.
 
+import asyncio
 import os
+import re
 from dotenv import load_dotenv
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_qdrant import QdrantVectorStore
-from openai import OpenAI
+from langchain_core.documents import Document
+from qdrant_client import AsyncQdrantClient, models
+from embedding_cache import CachedEmbeddings
+from collection import search_params, tenant_filter
+from openai import AsyncOpenAI, OpenAI
 
 load_dotenv()
 
-client = OpenAI(
-  api_key=os.getenv("GEMINI_API_KEY"),
-  base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
+embedding_model = "models/gemini-embedding-001"
+embeddings = CachedEmbeddings(
+  GoogleGenerativeAIEmbeddings(
+    model=embedding_model,
+    google_api_key=os.getenv("GEMINI_API_KEY")
+  ),
+  model=embedding_model
 )
 
-embeddings = GoogleGenerativeAIEmbeddings(
-  model="models/gemini-embedding-001",
-  google_api_key=os.getenv("GEMINI_API_KEY")
-)
+# "single" (one similarity search) or "multi" (rephrasings + reciprocal-rank fusion)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "single")
+MULTI_QUERY_COUNT = int(os.getenv("MULTI_QUERY_COUNT", 3))
+# Standard RRF constant: damps the weight of the very top ranks
+RRF_K = 60
+TOP_K = 4
 
-vector_store = QdrantVectorStore.from_existing_collection(
-  url="http://localhost:6333",
-  collection_name="my_collection",
-  embedding=embeddings
-)
+# Shared collection: only the current tenant's chunks are searched
+collection_name = os.getenv("COLLECTION_NAME", "my_collection")
+tenant_id = os.getenv("TENANT_ID", "default")
 
-user_query = input("👉: ")
+query_filter = tenant_filter(tenant_id)
+# On a quantized collection: fetch oversampling x k candidates, rescore them with the full vectors
+query_params = search_params()
+
+# -------------------------
+# Multi-query retrieval
+# -------------------------
+async def rephrase(llm: AsyncOpenAI, query: str) -> list[str]:
+  response = await llm.chat.completions.create(
+    model="gemini-2.5-flash",
+    messages=[{"role": "user", "content": (
+      f"Rewrite this question {MULTI_QUERY_COUNT} different ways to search a document with. "
+      f"Reply with one rewrite per line and nothing else.\n\nQuestion: {query}"
+    )}]
+  )
+  # Drop list markers ("1.", "-") the model may add anyway
+  lines = [re.sub(r"^\s*(?:[-*]|\d+[.)])\s*", "", line).strip() for line in response.choices[0].message.content.splitlines()]
+  return [line for line in lines if line][:MULTI_QUERY_COUNT]
+
+async def search(qdrant: AsyncQdrantClient, queries: list[str]):
+  # One embedding request and one Qdrant request for all queries (the server runs the searches in parallel)
+  if not queries:
+    return []
+  vectors = await embeddings.aembed_queries(queries, task_type="RETRIEVAL_QUERY")
+  responses = await qdrant.query_batch_points(collection_name, requests=[
+    models.QueryRequest(query=vector, filter=query_filter, params=query_params, limit=TOP_K, with_payload=True)
+    for vector in vectors
+  ])
+  return [response.points for response in responses]
+
+async def rephrased_search(llm: AsyncOpenAI, qdrant: AsyncQdrantClient, query: str):
+  return await search(qdrant, await rephrase(llm, query))
+
+def reciprocal_rank_fusion(ranked_lists):
+  scores, payloads = {}, {}
+  for points in ranked_lists:
+    for rank, point in enumerate(points):
+      scores[point.id] = scores.get(point.id, 0) + 1 / (RRF_K + rank + 1)
+      payloads[point.id] = point.payload
+  best = sorted(scores, key=scores.get, reverse=True)[:TOP_K]
+  return [Document(page_content=payloads[id]["page_content"], metadata=payloads[id]["metadata"]) for id in best]
 
-docs = vector_store.similarity_search(user_query) 
+async def multi_query_retrieve(llm: AsyncOpenAI, qdrant: AsyncQdrantClient, query: str):
+  # The original question is searched while the LLM is still writing the rephrasings
+  original, rephrased = await asyncio.gather(search(qdrant, [query]), rephrased_search(llm, qdrant, query))
+  return reciprocal_rank_fusion(original + rephrased)
 
-context = "\n\n\n".join([f"Page Content: {doc.page_content}\nPage Number: {doc.metadata['page']}" for doc in docs])
+# -------------------------
+# Answer
+# -------------------------
+def build_messages(query: str, docs):
+  context = "\n\n\n".join([f"Page Content: {doc.page_content}\nPage Number: {doc.metadata['page']}" for doc in docs])
 
-SYSTEM_PROMPT = f"""
+  system_prompt = f"""
   You are a helpful AI Assistant who answers user query based on the avialable context retrieved from a PDF file along with page_contents and page number.
 
   Context: {context}
 """
-
-openai_response = client.chat.completions.create(
-  model="gemini-2.5-flash",
-  messages=[
-    {"role": "system", "content": SYSTEM_PROMPT},
-    {"role": "user", "content": user_query}
+  return [
+    {"role": "system", "content": system_prompt},
+    {"role": "user", "content": query}
   ]
-)
 
-print(openai_response.choices[0].message.content)
\ No newline at end of file
+async def multi_query_answer(query: str) -> str:
+  # Only the async clients are built in this mode; both are closed before the event loop shuts down
+  llm = AsyncOpenAI(
+    api_key=os.getenv("GEMINI_API_KEY"),
+    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
+  )
+  qdrant = AsyncQdrantClient(url="http://localhost:6333")
+  try:
+    docs = await multi_query_retrieve(llm, qdrant, query)
+    response = await llm.chat.completions.create(model="gemini-2.5-flash", messages=build_messages(query, docs))
+    return response.choices[0].message.content
+  finally:
+    await qdrant.close()
+    await llm.close()
+
+def single_query_answer(query: str) -> str:
+  client = OpenAI(
+    api_key=os.getenv("GEMINI_API_KEY"),
+    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
+  )
+  vector_store = QdrantVectorStore.from_existing_collection(
+    url="http://localhost:6333",
+    collection_name=collection_name,
+    embedding=embeddings
+  )
+  docs = vector_store.similarity_search(query, filter=query_filter, search_params=query_params)
+  response = client.chat.completions.create(model="gemini-2.5-flash", messages=build_messages(query, docs))
+  return response.choices[0].message.content
+
+user_query = input("👉: ")
+
+if RETRIEVAL_MODE == "multi":
+  print(asyncio.run(multi_query_answer(user_query)))
+else:
+  print(single_query_answer(user_query))
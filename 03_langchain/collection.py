@@ -0,0 +1,77 @@
+# Layout of the shared Qdrant collection, used by main.py (ingest) and chat.py
+#
+# Tenancy: every tenant's chunks live in one collection. Points carry
+# `tenant_id` and `document_id` in their metadata, both keyword payload
+# indexes, and every search is filtered to one tenant. The tenant index is
+# marked `is_tenant`, so Qdrant stores each tenant's points together, and the
+# collection builds per-tenant HNSW graphs (payload_m) instead of one global
+# graph (m=0).
+#
+# Quantization: gemini-embedding-001 vectors are 3072 float32s (12 KB per
+# chunk). With quantization Qdrant keeps a compressed copy in RAM for the HNSW
+# search and moves the full-precision vectors to disk:
+#   scalar: int8 per dimension, 4x smaller
+#   binary: 1 bit per dimension, 32x smaller (works well for high-dim embeddings)
+# At query time `oversampling` x k candidates are fetched with the quantized
+# vectors and rescored with the original ones, which recovers most of the recall.
+
+import os
+from dotenv import load_dotenv
+from qdrant_client import models
+
+load_dotenv()
+
+TENANT_FIELD = "metadata.tenant_id"
+DOCUMENT_FIELD = "metadata.document_id"
+
+# "none", "scalar" or "binary"; only applied when the collection is created
+QUANTIZATION = os.getenv("QUANTIZATION", "none")
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QUANTIZATION_OVERSAMPLING", 2.0))
+QUANTIZATION_RESCORE = os.getenv("QUANTIZATION_RESCORE", "on") == "on"
+
+# -------------------------
+# Tenancy
+# -------------------------
+# Per-tenant HNSW graphs only; unfiltered search over all tenants is never needed
+HNSW_CONFIG = models.HnswConfigDiff(payload_m=16, m=0)
+
+PAYLOAD_INDEXES = {
+    TENANT_FIELD: models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+    DOCUMENT_FIELD: models.PayloadSchemaType.KEYWORD,
+}
+
+def tenant_filter(tenant_id: str) -> models.Filter:
+    return models.Filter(must=[models.FieldCondition(key=TENANT_FIELD, match=models.MatchValue(value=tenant_id))])
+
+# -------------------------
+# Quantization
+# -------------------------
+def quantization_config(kind: str = QUANTIZATION):
+    if kind == "scalar":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8, quantile=0.99, always_ram=True,
+        ))
+    if kind == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+def vectors_config(size: int, kind: str = QUANTIZATION) -> models.VectorParams:
+    # Full-precision vectors only go to disk when a quantized copy serves the search
+    return models.VectorParams(size=size, distance=models.Distance.COSINE, on_disk=kind != "none")
+
+def search_params(kind: str = QUANTIZATION, oversampling: float = QUANTIZATION_OVERSAMPLING, rescore: bool = QUANTIZATION_RESCORE):
+    if kind == "none":
+        return None
+    return models.SearchParams(quantization=models.QuantizationSearchParams(
+        rescore=rescore, oversampling=oversampling,
+    ))
+
+def create_collection(client, collection_name: str, vector_size: int):
+    client.create_collection(
+        collection_name,
+        vectors_config=vectors_config(vector_size),
+        hnsw_config=HNSW_CONFIG,
+        quantization_config=quantization_config(),
+    )
+    for field, schema in PAYLOAD_INDEXES.items():
+        client.create_payload_index(collection_name, field, field_schema=schema)
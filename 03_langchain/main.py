@@ -1,34 +1,175 @@
-# Create a vector store for a PDF file
+# Create a vector store for PDF files
+#
+# Run with: python main.py [file.pdf | directory | "glob/**/*.pdf" ...]   (default ./file.pdf)
+#
+# PDFs are parsed in a process pool (text extraction is CPU-bound), and the
+# extracted pages are cached on disk by file hash, so an unchanged PDF is
+# never parsed again. Parsed documents stream into a single embed/upsert stage
+# in the main process as soon as each one is ready.
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
 from pathlib import Path
+import json
 import os
+import sys
+import uuid
+import xxhash
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_core import documents
+from langchain_core.documents import Document
 from langchain_text_splitters import CharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient, models
+from embedding_cache import CachedEmbeddings
+from collection import DOCUMENT_FIELD, TENANT_FIELD, create_collection
 
 load_dotenv()
 
-pdf_path = Path("./file.pdf")
+# All tenants share one collection; points are tagged and searches filtered by tenant
+collection_name = os.getenv("COLLECTION_NAME", "my_collection")
+tenant_id = os.getenv("TENANT_ID", "default")
 
-loader = PyPDFLoader(pdf_path)
-docs = loader.load()
+# Parser processes, extracted-text cache, and chunks embedded/upserted per batch
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+TEXT_CACHE_DIR = Path(os.getenv("TEXT_CACHE_DIR", ".text_cache"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", 256))
 
 text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-chunks = text_splitter.split_documents(docs)
 
-embeddings = GoogleGenerativeAIEmbeddings(
-  model="models/gemini-embedding-001",
-  google_api_key=os.getenv("GEMINI_API_KEY")
-)
+# -------------------------
+# Parsing (process pool) + extracted-text cache
+# -------------------------
+def find_pdfs(patterns):
+  paths = []
+  for pattern in patterns:
+    if Path(pattern).is_dir():
+      paths.extend(Path(pattern).rglob("*.pdf"))
+    else:
+      paths.extend(Path(match) for match in glob(pattern, recursive=True))
+  return sorted(set(paths))
 
-vector_store = QdrantVectorStore.from_documents(
-  documents=chunks,
-  embedding=embeddings,
-  url="http://localhost:6333",
-  collection_name="my_collection"
-)
+def file_hash(path: Path) -> str:
+  digest = xxhash.xxh3_128()
+  with open(path, "rb") as f:
+    while block := f.read(1 << 20):
+      digest.update(block)
+  return digest.hexdigest()
 
-print("Indexing of documents is done")
+def cache_path(digest: str) -> Path:
+  return TEXT_CACHE_DIR / f"{digest}.json"
+
+def read_cached(digest: str):
+  return json.loads(cache_path(digest).read_text())
+
+def parse_pdf(path: Path, digest: str):
+  # Runs in a worker process; writes the cache entry itself so the main process only gets the pages
+  pages = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in PyPDFLoader(path).load()]
+  TEXT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+  tmp = cache_path(digest).with_suffix(f".{os.getpid()}.tmp")
+  tmp.write_text(json.dumps(pages))
+  os.replace(tmp, cache_path(digest))
+  return pages
+
+def parsed_documents(paths):
+  # Yields (path, pages, from_cache): every uncached file is submitted to the pool first,
+  # then cached files are yielded while the workers parse, then parsed files as they finish
+  with ProcessPoolExecutor(max_workers=INGEST_WORKERS) as pool:
+    futures, cached = {}, []
+    for path in paths:
+      digest = file_hash(path)
+      if cache_path(digest).exists():
+        cached.append((path, digest))
+      else:
+        futures[pool.submit(parse_pdf, path, digest)] = path
+    for path, digest in cached:
+      yield path, read_cached(digest), True
+    for future in as_completed(futures):
+      yield futures[future], future.result(), False
+
+# -------------------------
+# Embed + upsert (single stage, main process only)
+# -------------------------
+def chunk_id(document_id: str, chunk: Document) -> str:
+  # Deterministic point id: re-indexing an unchanged chunk overwrites its existing point
+  key = f"{tenant_id}\0{document_id}\0{chunk.page_content}"
+  return str(uuid.UUID(xxhash.xxh3_128_hexdigest(key.encode())))
+
+def stale_filter(document_id: str, ids):
+  # The document's points that the new version no longer has
+  return models.Filter(
+    must=[
+      models.FieldCondition(key=TENANT_FIELD, match=models.MatchValue(value=tenant_id)),
+      models.FieldCondition(key=DOCUMENT_FIELD, match=models.MatchValue(value=document_id)),
+    ],
+    must_not=[models.HasIdCondition(has_id=ids)],
+  )
+
+def main():
+  embedding_model = "models/gemini-embedding-001"
+  embeddings = CachedEmbeddings(
+    GoogleGenerativeAIEmbeddings(
+      model=embedding_model,
+      google_api_key=os.getenv("GEMINI_API_KEY")
+    ),
+    model=embedding_model
+  )
+  client = QdrantClient(url="http://localhost:6333")
+
+  paths = find_pdfs(sys.argv[1:] or ["./file.pdf"])
+  print(f"📄 {len(paths)} PDFs to index with {INGEST_WORKERS} parser processes")
+
+  vector_store = QdrantVectorStore(
+    client=client,
+    collection_name=collection_name,
+    embedding=embeddings,
+    validate_collection_config=False,
+  )
+
+  collection_ready = client.collection_exists(collection_name)
+  pending, pending_ids, pending_documents = [], [], []
+  indexed = cached = chunk_count = 0
+
+  def flush():
+    nonlocal chunk_count, collection_ready
+    if not collection_ready:
+      # Embeddings are cached, so the first chunk isn't embedded twice
+      vector_size = len(embeddings.embed_documents([pending[0].page_content])[0])
+      create_collection(client, collection_name, vector_size)
+      collection_ready = True
+    vector_store.add_documents(pending, ids=pending_ids, batch_size=UPSERT_BATCH_SIZE)
+    # Only now that the new chunks are stored are the old ones removed, so a re-indexed
+    # document stays searchable throughout (documents are never split across flushes)
+    for document_id, ids in pending_documents:
+      client.delete(collection_name, points_selector=models.FilterSelector(filter=stale_filter(document_id, ids)))
+    chunk_count += len(pending)
+    pending.clear()
+    pending_ids.clear()
+    pending_documents.clear()
+
+  for path, pages, from_cache in parsed_documents(paths):
+    document_id = path.as_posix()
+    chunks = text_splitter.split_documents([Document(**page) for page in pages])
+    for chunk in chunks:
+      chunk.metadata.update(tenant_id=tenant_id, document_id=document_id)
+
+    ids = [chunk_id(document_id, chunk) for chunk in chunks]
+    pending.extend(chunks)
+    pending_ids.extend(ids)
+    pending_documents.append((document_id, ids))
+    if len(pending) >= UPSERT_BATCH_SIZE:
+      flush()
+
+    indexed += 1
+    cached += from_cache
+    print(f"📦 {indexed}/{len(paths)} {document_id} ({len(chunks)} chunks{', cached text' if from_cache else ''})")
+
+  if pending:
+    flush()
+
+  print(f"✅ Indexing of documents is done ({indexed} PDFs, {cached} from the text cache, {chunk_count} chunks)")
+  print(f"🗃️  Embedding cache: {embeddings.stats()}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,73 @@
+# Benchmark: Redis memory used by job results, plain pickle vs zstd
+#
+# Stores a synthetic corpus of LLM-style answers as RQ results twice (once with
+# RQ's default pickle serializer, once with ZstdPickleSerializer) and compares
+# the payload bytes and the Redis memory (MEMORY USAGE) of the result keys.
+#
+# Run with: python bench_results.py [number_of_answers]
+
+import random
+import sys
+from uuid import uuid4
+from rq.results import Result
+from rq.serializers import DefaultSerializer
+from queues.serializer import ZstdPickleSerializer
+from rq_client import redis_client
+
+WORDS = (
+    "the model answer query context document section result data value system user "
+    "request response function example step first second finally however because "
+    "therefore using based return list table error configuration performance latency "
+    "memory cache queue worker server client redis python api field type option"
+).split()
+
+def synthetic_answer(rng: random.Random) -> str:
+    # Markdown-ish answers: a few paragraphs and bullet lists of 500-8000 chars
+    parts = []
+    target = rng.randint(500, 8000)
+    while sum(len(part) for part in parts) < target:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20)))
+        prefix = "- " if rng.random() < 0.3 else ""
+        parts.append(f"{prefix}{sentence.capitalize()}.")
+    return "\n".join(parts)
+
+def store(answers, serializer, prefix: str):
+    # Same write path RQ uses for finished jobs (one result stream entry per job)
+    with redis_client.pipeline() as pipeline:
+        for i, answer in enumerate(answers):
+            result = Result(
+                f"{prefix}-{i}",
+                Result.Type.SUCCESSFUL,
+                connection=redis_client,
+                return_value=answer,
+                serializer=serializer,
+            )
+            result.save(ttl=600, pipeline=pipeline)
+        pipeline.execute()
+
+    keys = [Result.get_key(f"{prefix}-{i}") for i in range(len(answers))]
+    with redis_client.pipeline() as pipeline:
+        for key in keys:
+            pipeline.memory_usage(key)
+        memory = sum(pipeline.execute())
+    redis_client.delete(*keys)
+    return memory
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = random.Random(42)
+    answers = [synthetic_answer(rng) for _ in range(count)]
+
+    plain_bytes = sum(len(DefaultSerializer.dumps(answer)) for answer in answers)
+    zstd_bytes = sum(len(ZstdPickleSerializer.dumps(answer)) for answer in answers)
+
+    print(f"📚 {count} synthetic answers, {sum(len(a) for a in answers) / count:.0f} chars on average")
+    print(f"📦 Payload bytes:  pickle {plain_bytes:,}  zstd {zstd_bytes:,}  ({1 - zstd_bytes / plain_bytes:.1%} smaller)")
+
+    prefix = f"bench-{uuid4()}"
+    plain_memory = store(answers, DefaultSerializer, f"{prefix}-plain")
+    zstd_memory = store(answers, ZstdPickleSerializer, f"{prefix}-zstd")
+    print(f"🧠 Redis memory:   pickle {plain_memory:,}  zstd {zstd_memory:,}  ({1 - zstd_memory / plain_memory:.1%} saved)")
+
+if __name__ == "__main__":
+    main()
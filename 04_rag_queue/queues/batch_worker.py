@@ -0,0 +1,159 @@
+# Micro-batching RQ worker
+#
+# Instead of forking one process per job, this worker drains up to BATCH_SIZE
+# queued jobs (or whatever arrived within BATCH_WAIT_MS of the first one) and
+# runs their LLM calls concurrently on one pooled async client. Each result is
+# still written back to its own job, so /job-status and callbacks work as usual.
+#
+# Run with: python -m queues.batch_worker
+
+import asyncio
+import os
+import sys
+import time
+import traceback
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from rq import SimpleWorker
+from rq.worker import StopRequested, WorkerStatus
+from rq.utils import utcnow
+from queues.worker import MODEL, build_messages
+
+load_dotenv()
+
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", 16))
+BATCH_WAIT_MS = int(os.getenv("BATCH_WAIT_MS", 50))
+DEFAULT_JOB_TIMEOUT = 180
+
+# One client per worker process; its HTTP connection pool is reused across batches
+async_client = AsyncOpenAI(
+  api_key=os.getenv("GEMINI_API_KEY"),
+  base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
+)
+
+async def aprocess_query(user_query: str):
+    response = await async_client.chat.completions.create(
+        model=MODEL,
+        messages=build_messages(user_query)
+    )
+
+    print(f"🤖: {response.choices[0].message.content}")
+    return response.choices[0].message.content
+
+# Jobs whose function has an async twin are run on the shared client,
+# anything else is run in a thread just like a normal job
+ASYNC_HANDLERS = {
+    "queues.worker.process_query": aprocess_query,
+}
+
+class BatchWorker(SimpleWorker):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # A single long-lived loop, so the async client's connections stay warm
+        self.loop = asyncio.new_event_loop()
+
+    def dequeue_batch(self, batch_size: int, max_wait_ms: int):
+        # Block (with heartbeats) for the first job...
+        first = self.dequeue_job_and_maintain_ttl(self.dequeue_timeout)
+        if first is None:
+            return []
+        batch = [first]
+
+        # ...then collect whatever else shows up within the batching window
+        deadline = time.monotonic() + max_wait_ms / 1000
+        while len(batch) < batch_size:
+            result = self.queue_class.dequeue_any(
+                self._ordered_queues,
+                None,
+                connection=self.connection,
+                job_class=self.job_class,
+                serializer=self.serializer,
+            )
+            if result is not None:
+                batch.append(result)
+            elif time.monotonic() >= deadline:
+                break
+            else:
+                time.sleep(0.005)
+        return batch
+
+    async def perform_async(self, job):
+        handler = ASYNC_HANDLERS.get(job.func_name)
+        if handler is not None:
+            coro = handler(*job.args, **job.kwargs)
+        else:
+            coro = asyncio.to_thread(job.perform)
+        timeout = job.timeout or DEFAULT_JOB_TIMEOUT
+        return await asyncio.wait_for(coro, None if timeout == -1 else timeout)
+
+    async def perform_batch(self, batch):
+        return await asyncio.gather(
+            *(self.perform_async(job) for job, _ in batch),
+            return_exceptions=True
+        )
+
+    def finish_job(self, job, queue, result):
+        job.ended_at = utcnow()
+        if not isinstance(result, BaseException):
+            job._result = result
+            try:
+                job.execute_success_callback(self.death_penalty_class, result)
+                self.handle_job_success(job=job, queue=queue, started_job_registry=queue.started_job_registry)
+                return
+            except Exception:
+                exc_info = sys.exc_info()
+        else:
+            exc_info = (type(result), result, result.__traceback__)
+
+        exc_string = "".join(traceback.format_exception(*exc_info))
+        try:
+            job.execute_failure_callback(self.death_penalty_class, *exc_info)
+        except Exception:
+            exc_info = sys.exc_info()
+            exc_string = "".join(traceback.format_exception(*exc_info))
+        self.handle_job_failure(job=job, queue=queue, started_job_registry=queue.started_job_registry, exc_string=exc_string)
+        self.handle_exception(job, *exc_info)
+
+    def execute_batch(self, batch):
+        self.set_state(WorkerStatus.BUSY)
+        for job, _ in batch:
+            self.prepare_job_execution(job, remove_from_intermediate_queue=len(self.queues) == 1)
+            job.started_at = utcnow()
+
+        started = time.monotonic()
+        results = self.loop.run_until_complete(self.perform_batch(batch))
+        self.log.info("Batch of %d jobs done in %.2fs", len(batch), time.monotonic() - started)
+
+        for (job, queue), result in zip(batch, results):
+            self.finish_job(job, queue, result)
+        self.set_state(WorkerStatus.IDLE)
+
+    def work_batches(self, batch_size: int = BATCH_SIZE, max_wait_ms: int = BATCH_WAIT_MS):
+        self.bootstrap()
+        self._install_signal_handlers()
+        try:
+            while not self._stop_requested:
+                self.check_for_suspension(burst=False)
+                if self.should_run_maintenance_tasks:
+                    self.run_maintenance_tasks()
+
+                batch = self.dequeue_batch(batch_size, max_wait_ms)
+                if batch:
+                    self.execute_batch(batch)
+                    self.heartbeat()
+        except StopRequested:
+            pass
+        finally:
+            self.teardown()
+            self.loop.run_until_complete(async_client.close())
+            self.loop.close()
+
+def main():
+    from rq_client import queues, serializer, redis_client
+
+    # Lanes are passed highest priority first, so interactive jobs fill batches first
+    worker = BatchWorker(list(queues.values()), connection=redis_client, serializer=serializer)
+    worker.work_batches()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# RQ serializer that zstd-compresses job payloads and results
+#
+# LLM answers are long, repetitive text, and RQ pickles them into Redis as-is.
+# Compressing them shrinks Redis memory and every /job-status read. Loads
+# detects the zstd frame header, so plain pickles written before compression
+# was turned on (or with RESULT_COMPRESSION=none) still load fine.
+
+import os
+import pickle
+import zstandard
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESULT_COMPRESSION = os.getenv("RESULT_COMPRESSION", "zstd")
+COMPRESSION_LEVEL = int(os.getenv("RESULT_COMPRESSION_LEVEL", 3))
+
+# Smaller payloads (job args, short answers) barely shrink, so they stay plain pickle
+MIN_COMPRESS_SIZE = 256
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+class ZstdPickleSerializer:
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+        if RESULT_COMPRESSION == "zstd" and len(data) >= MIN_COMPRESS_SIZE:
+            return zstandard.compress(data, COMPRESSION_LEVEL)
+        return data
+
+    @staticmethod
+    def loads(data, *args, **kwargs):
+        if data[:4] == ZSTD_MAGIC:
+            data = zstandard.decompress(data)
+        return pickle.loads(data)
@@ -1,6 +1,9 @@
 from openai import OpenAI
 from dotenv import load_dotenv
+import hashlib
+import json
 import os
+import time
 
 load_dotenv()
 
@@ -10,15 +13,88 @@ client = OpenAI(
 )
 
 SYSTEM_PROMPT = os.getenv("SYSTEM_PROMPT", "Answer my below question")
+MODEL = "gemini-2.5-flash"
+
+# How long a finished answer is served from cache, and how long a queued
+# query stays claimed so duplicates attach to its job instead of enqueueing
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 300))
+INFLIGHT_TTL = int(os.getenv("INFLIGHT_TTL", 300))
+
+# Window (seconds) completed jobs are counted over to estimate each lane's
+# drain rate, and how many recent queue wait samples are kept per lane
+DRAIN_WINDOW = int(os.getenv("DRAIN_WINDOW", 60))
+WAIT_SAMPLES = 1000
+
+def build_messages(user_query: str):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_query}
+    ]
 
 def process_query(user_query: str):
     response = client.chat.completions.create(
-        model="gemini-2.5-flash",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_query}
-        ]
+        model=MODEL,
+        messages=build_messages(user_query)
     )
 
     print(f"🤖: {response.choices[0].message.content}")
     return response.choices[0].message.content
+
+# Pub/sub channel a job's outcome is announced on, so clients waiting on the
+# server are pushed the answer instead of polling /job-status
+def job_channel(job_id: str) -> str:
+    return f"rag:job-done:{job_id}"
+
+# Queries that only differ by case or whitespace, asked against the same
+# model and system prompt, share one hash (and so one job / cached answer)
+def query_hash(user_query: str) -> str:
+    normalized = " ".join(user_query.split()).casefold()
+    return hashlib.sha256(f"{MODEL}\0{SYSTEM_PROMPT}\0{normalized}".encode()).hexdigest()
+
+def inflight_key(query_hash: str) -> str:
+    return f"rag:inflight:{query_hash}"
+
+def answer_key(query_hash: str) -> str:
+    return f"rag:answer:{query_hash}"
+
+def drained_key(queue_name: str) -> str:
+    return f"rag:drained:{queue_name}"
+
+def wait_key(queue_name: str) -> str:
+    return f"rag:wait-ms:{queue_name}"
+
+# Feeds the server's Retry-After estimate and the /metrics wait percentiles
+def record_completion(job, pipeline):
+    now = time.time()
+    pipeline.zadd(drained_key(job.origin), {job.id: now})
+    pipeline.zremrangebyscore(drained_key(job.origin), "-inf", now - DRAIN_WINDOW)
+    if job.enqueued_at and job.started_at:
+        wait_ms = (job.started_at - job.enqueued_at).total_seconds() * 1000
+        pipeline.lpush(wait_key(job.origin), round(wait_ms))
+        pipeline.ltrim(wait_key(job.origin), 0, WAIT_SAMPLES - 1)
+
+# RQ job callbacks (run inside the worker right after the job ends)
+def report_success(job, connection, result, *args, **kwargs):
+    with connection.pipeline() as pipeline:
+        record_completion(job, pipeline)
+        if key := job.meta.get("query_hash"):
+            # The model can return no content; Redis can't store None, and it isn't worth caching
+            if result is not None:
+                pipeline.set(answer_key(key), result, ex=ANSWER_CACHE_TTL)
+            pipeline.delete(inflight_key(key))
+        pipeline.publish(
+            job_channel(job.id),
+            json.dumps({"status": "finished", "result": result})
+        )
+        pipeline.execute()
+
+def report_failure(job, connection, type, value, traceback):
+    with connection.pipeline() as pipeline:
+        record_completion(job, pipeline)
+        if key := job.meta.get("query_hash"):
+            pipeline.delete(inflight_key(key))
+        pipeline.publish(
+            job_channel(job.id),
+            json.dumps({"status": "failed", "result": str(value)})
+        )
+        pipeline.execute()
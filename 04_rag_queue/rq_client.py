@@ -1,16 +1,56 @@
 import redis
+import redis.asyncio
 from rq import Queue
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
+from queues.serializer import ZstdPickleSerializer
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+
 # Redis connection
 redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "localhost"),
-    port=int(os.getenv("REDIS_PORT", 6379)),
-    db=int(os.getenv("REDIS_DB", 0))
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB
+)
+
+# Async Redis connection, used by the server to wait on job completion
+# through pub/sub without blocking the event loop
+async_redis_client = redis.asyncio.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB
 )
 
-# Create RQ queue
-queue = Queue(connection=redis_client)
+# Priority lanes, highest priority first. Workers are started with the
+# queue names in this order, so they always drain "interactive" first.
+QUEUE_NAMES = ["interactive", "batch"]
+
+# Max number of waiting jobs per lane before /chat starts answering 429
+QUEUE_LIMITS = {
+    "interactive": int(os.getenv("INTERACTIVE_QUEUE_LIMIT", 100)),
+    "batch": int(os.getenv("BATCH_QUEUE_LIMIT", 1000)),
+}
+
+# Seconds a finished job's result is kept in Redis
+RESULT_TTL = int(os.getenv("RESULT_TTL", 3600))
+
+# Every reader and writer of jobs must agree on the serializer. The stock worker
+# is started with `--serializer queues.serializer.ZstdPickleSerializer`.
+serializer = ZstdPickleSerializer
+
+# Create RQ queues
+queues = {name: Queue(name, connection=redis_client, serializer=serializer) for name in QUEUE_NAMES}
+
+# Jobs can live in any lane, so look them up by id instead of through a queue
+def fetch_job(job_id: str):
+    try:
+        return Job.fetch(job_id, connection=redis_client, serializer=serializer)
+    except NoSuchJobError:
+        return None
@@ -1,32 +1,222 @@
-from fastapi import FastAPI, Query
-from queues.worker import process_query
-from rq_client import queue
+import asyncio
+import json
+import math
+import statistics
+import time
+from typing import Literal
+from uuid import uuid4
+from fastapi import FastAPI, Query, Body, HTTPException
+from fastapi.responses import StreamingResponse
+from rq.job import Job, JobStatus
+from rq.results import Result
+from queues.worker import (
+    process_query,
+    job_channel,
+    report_success,
+    report_failure,
+    query_hash,
+    inflight_key,
+    answer_key,
+    drained_key,
+    wait_key,
+    INFLIGHT_TTL,
+    DRAIN_WINDOW,
+)
+from rq_client import queues, fetch_job, serializer, redis_client, async_redis_client, QUEUE_LIMITS, RESULT_TTL
 from dotenv import load_dotenv
 
 load_dotenv()
 
 app = FastAPI()
 
+# Max number of seconds a client can hold a /job-wait or /job-stream request open
+MAX_WAIT_TIMEOUT = 60
+
+# While waiting on a job's channel, its saved status is also re-read this often (seconds)
+STATUS_RECHECK_INTERVAL = 1
+
+# Bounds for the Retry-After header sent with a 429
+MAX_RETRY_AFTER = 120
+
+def job_payload(job):
+    if job is None:
+        return {"status": "not_found", "result": None}
+    if job.is_finished:
+        return {"status": "finished", "result": job.result}
+    elif job.is_failed:
+        return {"status": "failed", "result": str(job.exc_info)}
+    else:
+        return {"status": "queued", "result": None}
+
+async def wait_for_job(job_id: str, timeout: float):
+    """Waits on the job's pub/sub channel until the worker reports it done or the timeout expires."""
+    pubsub = async_redis_client.pubsub()
+    # Subscribe before checking the status, so a job finishing in between is not missed
+    await pubsub.subscribe(job_channel(job_id))
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            # RQ runs the callback (which publishes) before it saves the final status, so a job
+            # finishing right as we subscribe publishes unseen; re-reading the status catches it
+            status = await async_redis_client.hget(Job.key_for(job_id), "status")
+            if status is None or status.decode() in (JobStatus.FINISHED, JobStatus.FAILED):
+                job = await asyncio.to_thread(fetch_job, job_id)
+                return job_payload(job)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return job_payload(await asyncio.to_thread(fetch_job, job_id))
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, STATUS_RECHECK_INTERVAL))
+            if message is not None:
+                return json.loads(message["data"])
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+# Deletes a query's in-flight claim only if it still names this job, so a claim
+# another request has taken since is left alone
+release_claim = redis_client.register_script(
+    "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end return 0"
+)
+
+def lane_load(name: str):
+    """Returns the lane's current depth and its drain rate (jobs/sec) over the last DRAIN_WINDOW seconds."""
+    with redis_client.pipeline() as pipeline:
+        pipeline.llen(queues[name].key)
+        pipeline.zcount(drained_key(name), time.time() - DRAIN_WINDOW, "+inf")
+        depth, drained = pipeline.execute()
+    return depth, drained / DRAIN_WINDOW
+
+def retry_after(name: str, depth: int, drain_rate: float) -> int:
+    # Time until enough jobs drain for the lane to drop back under its limit
+    if drain_rate == 0:
+        return MAX_RETRY_AFTER
+    backlog = depth - QUEUE_LIMITS[name] + 1
+    return min(MAX_RETRY_AFTER, max(1, math.ceil(backlog / drain_rate)))
+
 @app.get("/")
 def read_root():
     return {"message": "Hello, World!"}
 
 @app.post("/chat")
 def chat(
-    query: str = Query(..., description="The query to search the vector store")
+    query: str = Query(..., description="The query to search the vector store"),
+    priority: Literal["interactive", "batch"] = Query("interactive", description="The lane to queue the query on")
 ):
-  job = queue.enqueue(process_query, query)
+  key = query_hash(query)
+
+  # A recent identical query is answered straight from the cache
+  cached = redis_client.get(answer_key(key))
+  if cached is not None:
+      return { "status": "finished", "job_id": None, "result": cached.decode() }
+
+  # Claim the query for a new job; if it is already in flight, attach to that job
+  job_id = str(uuid4())
+  owner = redis_client.set(inflight_key(key), job_id, nx=True, get=True, ex=INFLIGHT_TTL)
+  if owner is not None:
+      return { "status": "queued", "job_id": owner.decode() }
+
+  # Admission control: shed load once the lane is full instead of letting latency grow without bound
+  depth, drain_rate = lane_load(priority)
+  if depth >= QUEUE_LIMITS[priority]:
+      release_claim(keys=[inflight_key(key)], args=[job_id])
+      raise HTTPException(
+          status_code=429,
+          detail=f"The {priority} queue is full, try again later",
+          headers={"Retry-After": str(retry_after(priority, depth, drain_rate))}
+      )
+
+  try:
+      job = queues[priority].enqueue(
+          process_query,
+          query,
+          job_id=job_id,
+          meta={"query_hash": key},
+          result_ttl=RESULT_TTL,
+          on_success=report_success,
+          on_failure=report_failure
+      )
+  except Exception:
+      # Otherwise duplicates would attach to a job that never exists until the claim expires
+      release_claim(keys=[inflight_key(key)], args=[job_id])
+      raise
 
   return { "status": "queued", "job_id": job.id }
 
 @app.get("/job-status")
 def dequeue(job_id: str = Query(..., description="The job_id to retrieve results for")):
-    job = queue.fetch_job(job_id)
-    if job is None:
-        return {"status": "not_found", "result": None}
-    if job.is_finished:
-        return {"status": "finished", "result": job.result}
-    elif job.is_failed:
-        return {"status": "failed", "result": str(job.exc_info)}
-    else:
-        return {"status": "queued", "result": None}
\ No newline at end of file
+    return job_payload(fetch_job(job_id))
+
+@app.post("/job-status/bulk")
+def bulk_status(job_ids: list[str] = Body(..., embed=True, description="The job_ids to retrieve results for")):
+    # One pipelined round trip for all job hashes...
+    jobs = Job.fetch_many(job_ids, connection=redis_client, serializer=serializer)
+    done = [
+        job for job in jobs
+        if job is not None and job.get_status(refresh=False) in (JobStatus.FINISHED, JobStatus.FAILED)
+    ]
+
+    # ...and one more for the latest result of every job that has ended
+    with redis_client.pipeline() as pipeline:
+        for job in done:
+            pipeline.xrevrange(Result.get_key(job.id), "+", "-", count=1)
+        latest = dict(zip((job.id for job in done), pipeline.execute()))
+
+    statuses = {}
+    for job_id, job in zip(job_ids, jobs):
+        if job is None:
+            statuses[job_id] = {"status": "not_found", "result": None}
+        elif not latest.get(job_id):
+            statuses[job_id] = {"status": "queued", "result": None}
+        else:
+            result_id, payload = latest[job_id][0]
+            result = Result.restore(job_id, result_id.decode(), payload, connection=redis_client, serializer=serializer)
+            if result.type == Result.Type.SUCCESSFUL:
+                statuses[job_id] = {"status": "finished", "result": result.return_value}
+            else:
+                statuses[job_id] = {"status": "failed", "result": result.exc_string}
+
+    return statuses
+
+@app.get("/job-wait")
+async def job_wait(
+    job_id: str = Query(..., description="The job_id to wait for"),
+    timeout: float = Query(30, gt=0, le=MAX_WAIT_TIMEOUT, description="Seconds to wait before returning the current status")
+):
+    # Long-poll: the request is held open until the job ends or the timeout expires
+    return await wait_for_job(job_id, timeout)
+
+@app.get("/job-stream")
+async def job_stream(
+    job_id: str = Query(..., description="The job_id to stream results for"),
+    timeout: float = Query(MAX_WAIT_TIMEOUT, gt=0, le=MAX_WAIT_TIMEOUT, description="Seconds to wait before closing the stream")
+):
+    # Server-Sent Events: the job's current status right away, then, if it was still queued,
+    # the final status once the worker publishes it
+    async def events():
+        payload = job_payload(await asyncio.to_thread(fetch_job, job_id))
+        yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+        if payload["status"] == "queued":
+            payload = await wait_for_job(job_id, timeout)
+            yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/metrics")
+def metrics():
+    # Queue depth, drain rate and queue wait percentiles per lane, for sizing the worker fleet
+    lanes = {}
+    for name in queues:
+        depth, drain_rate = lane_load(name)
+        waits = [int(wait) for wait in redis_client.lrange(wait_key(name), 0, -1)]
+        lane = {
+            "depth": depth,
+            "limit": QUEUE_LIMITS[name],
+            "drain_rate": round(drain_rate, 3),
+            "wait_ms": None,
+        }
+        if len(waits) >= 2:
+            cuts = statistics.quantiles(waits, n=100)
+            lane["wait_ms"] = {"p50": cuts[49], "p90": cuts[89], "p99": cuts[98], "samples": len(waits)}
+        lanes[name] = lane
+    return lanes
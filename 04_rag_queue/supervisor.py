@@ -0,0 +1,98 @@
+# Worker pool supervisor
+#
+# The stock `rq worker` forks a fresh work horse for every job, so each job pays
+# the import cost and builds a new OpenAI client with a cold HTTP connection.
+# This supervisor runs a pool of long-lived, non-forking workers instead: every
+# process imports the worker code and builds its client once, then reuses the
+# same connection pool for every job it runs.
+#
+# The pool scales between POOL_MIN_WORKERS and POOL_MAX_WORKERS based on how
+# many jobs are waiting in Redis. Set both to the same value for a fixed pool.
+#
+# Run with: python supervisor.py
+
+import importlib
+import math
+import multiprocessing
+import os
+import signal
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MIN_WORKERS = int(os.getenv("POOL_MIN_WORKERS", 1))
+MAX_WORKERS = int(os.getenv("POOL_MAX_WORKERS", 8))
+# Waiting jobs one worker is expected to absorb before another one is started
+JOBS_PER_WORKER = int(os.getenv("POOL_JOBS_PER_WORKER", 10))
+# Seconds between scaling decisions
+SCALE_INTERVAL = float(os.getenv("POOL_SCALE_INTERVAL", 5))
+# "simple" runs one job at a time per process, "batch" runs queues.batch_worker
+WORKER_MODE = os.getenv("POOL_WORKER_MODE", "simple")
+
+def run_worker(mode: str):
+    # Imported in the child, so every process builds its own clients exactly once
+    from rq import SimpleWorker
+    from rq_client import queues, serializer, redis_client
+
+    lanes = list(queues.values())
+    if mode == "batch":
+        from queues.batch_worker import BatchWorker
+        BatchWorker(lanes, connection=redis_client, serializer=serializer).work_batches()
+    else:
+        # Build the OpenAI client before the first job instead of during it
+        importlib.import_module("queues.worker")
+        SimpleWorker(lanes, connection=redis_client, serializer=serializer).work()
+
+def desired_workers(depth: int) -> int:
+    return min(MAX_WORKERS, max(MIN_WORKERS, math.ceil(depth / JOBS_PER_WORKER)))
+
+def main():
+    from rq_client import queues, redis_client
+
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    retiring = []
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    while not stopping:
+        # Drop workers that died (they get replaced below) and reap retired ones
+        workers = [worker for worker in workers if worker.is_alive()]
+        retiring = [worker for worker in retiring if worker.is_alive()]
+
+        with redis_client.pipeline() as pipeline:
+            for lane in queues.values():
+                pipeline.llen(lane.key)
+            depth = sum(pipeline.execute())
+
+        target = desired_workers(depth)
+        if len(workers) < target:
+            print(f"📈 {depth} jobs waiting, scaling {len(workers)} → {target} workers")
+            while len(workers) < target:
+                worker = context.Process(target=run_worker, args=(WORKER_MODE,))
+                worker.start()
+                workers.append(worker)
+        elif len(workers) > target:
+            # Retire one worker per interval; SIGTERM makes rq finish its current job first
+            print(f"📉 {depth} jobs waiting, scaling {len(workers)} → {len(workers) - 1} workers")
+            worker = workers.pop()
+            worker.terminate()
+            retiring.append(worker)
+
+        time.sleep(SCALE_INTERVAL)
+
+    print("🛑 Stopping worker pool...")
+    for worker in workers:
+        worker.terminate()
+    for worker in workers + retiring:
+        worker.join()
+
+if __name__ == "__main__":
+    main()
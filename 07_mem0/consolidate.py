@@ -0,0 +1,164 @@
+# Offline consolidation of the mem0 collection
+#
+# Every chat turn can add memories, so a user's collection keeps growing and so
+# do search latency and the memory block in SYSTEM_PROMPT. This job, run e.g.
+# nightly while nobody chats, bounds it per user:
+#   1. memories are clustered by embedding similarity (newest first, greedy)
+#   2. near-identical members of a cluster are redundant: the newest one is kept
+#   3. other clusters are merged by the LLM into one memory (newer facts win),
+#      stored on the newest member; the older, superseded members are removed
+#   4. if a user still has more than the cap, their least recently updated
+#      memories are removed
+# Changes go through mem0 (memory.update / memory.delete), so its history DB
+# stays in line; a cluster whose merge fails is left as it is.
+#
+# Run with: python consolidate.py [--user Dhanush] [--dry-run]
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dotenv import load_dotenv
+from mem0 import Memory
+from openai import OpenAI
+from qdrant_client import models
+from mem_config import GEMINI_API_KEY, config
+
+load_dotenv()
+
+CONSOLIDATE_THRESHOLD = float(os.getenv("CONSOLIDATE_THRESHOLD", 0.85))
+CONSOLIDATE_DUPLICATE = float(os.getenv("CONSOLIDATE_DUPLICATE", 0.97))
+CONSOLIDATE_MAX_MEMORIES = int(os.getenv("CONSOLIDATE_MAX_MEMORIES", 500))
+CONSOLIDATE_WORKERS = int(os.getenv("CONSOLIDATE_WORKERS", 8))
+
+client = OpenAI(
+  api_key=GEMINI_API_KEY,
+  base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
+)
+
+# -------------------------
+# Load
+# -------------------------
+def load_memories(memory, user_id=None):
+    # All points with vectors, grouped by user
+    store = memory.vector_store
+    scroll_filter = None
+    if user_id:
+        scroll_filter = models.Filter(must=[models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id))])
+
+    users, offset = {}, None
+    while True:
+        points, offset = store.client.scroll(
+            store.collection_name, scroll_filter=scroll_filter, limit=256, offset=offset, with_payload=True, with_vectors=True
+        )
+        for point in points:
+            if point.payload.get("user_id"):
+                users.setdefault(point.payload["user_id"], []).append(point)
+        if offset is None:
+            return users
+
+def recency(point):
+    return point.payload.get("updated_at") or point.payload.get("created_at") or ""
+
+# -------------------------
+# Cluster + merge
+# -------------------------
+def cluster(points):
+    # Greedy: newest first, each memory joins the cluster whose newest member is most similar, if similar enough
+    vectors = np.asarray([point.vector for point in points], dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    clusters, heads = [], []
+    for index in range(len(points)):
+        if heads:
+            similarities = vectors[heads] @ vectors[index]
+            best = int(np.argmax(similarities))
+            if similarities[best] >= CONSOLIDATE_THRESHOLD:
+                clusters[best].append((points[index], float(similarities[best])))
+                continue
+        heads.append(index)
+        clusters.append([(points[index], 1.0)])
+    return clusters
+
+def merge(texts):
+    response = client.chat.completions.create(
+        model="gemini-2.5-flash",
+        messages=[{"role": "user", "content": (
+            "These memories about the same user overlap. Combine them into one short memory that keeps every "
+            "distinct fact. They are listed newest first; when they contradict each other, keep the newest.\n"
+            "Reply with the merged memory only.\n\n" + "\n".join(f"- {text}" for text in texts)
+        )}]
+    )
+    return response.choices[0].message.content.strip()
+
+def delete_memories(memory, ids) -> int:
+    # Through mem0, so its history DB records the deletions too
+    deleted = 0
+    for memory_id in ids:
+        try:
+            memory.delete(str(memory_id))
+            deleted += 1
+        except Exception as e:
+            print(f"⚠️  Could not delete memory {memory_id}: {e}")
+    return deleted
+
+def consolidate_user(memory, points, dry_run: bool, pool):
+    points = sorted(points, key=recency, reverse=True)
+    # Clusters are in order of their newest member, so the ones past the cap are the least recently updated
+    clusters = cluster(points)
+    kept, over_cap = clusters[:CONSOLIDATE_MAX_MEMORIES], clusters[CONSOLIDATE_MAX_MEMORIES:]
+
+    report = {"before": len(points), "merged": 0, "redundant": 0, "over_cap": 0, "failed": 0}
+    merges = []
+    for members in kept:
+        head, older = members[0][0], [point.id for point, _ in members[1:]]
+        # Older members that only repeat the newest one need no merge
+        distinct = [point.payload["data"] for point, similarity in members[1:] if similarity < CONSOLIDATE_DUPLICATE]
+        if distinct:
+            merges.append((head, older, [head.payload["data"]] + distinct))
+        elif older:
+            report["redundant"] += len(older) if dry_run else delete_memories(memory, older)
+    over_cap_ids = [point.id for members in over_cap for point, _ in members]
+    report["over_cap"] = len(over_cap_ids) if dry_run else delete_memories(memory, over_cap_ids)
+
+    if dry_run:
+        report["merged"] = len(merges)
+        report["redundant"] += sum(len(older) for _, older, _ in merges)
+    else:
+        futures = [pool.submit(merge, texts) for _, _, texts in merges]
+        for (head, older, _), future in zip(merges, futures):
+            # A failed cluster is left as it is; the rest of the job goes on
+            try:
+                memory.update(str(head.id), future.result())
+            except Exception as e:
+                report["failed"] += 1
+                print(f"⚠️  Could not merge into memory {head.id}: {e}")
+                continue
+            report["merged"] += 1
+            report["redundant"] += delete_memories(memory, older)
+
+    report["after"] = report["before"] - report["redundant"] - report["over_cap"]
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge redundant mem0 memories and cap each user's memory count")
+    parser.add_argument("--user", help="only consolidate this user")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    memory = Memory.from_config(config)
+    users = load_memories(memory, args.user)
+
+    before = after = 0
+    with ThreadPoolExecutor(max_workers=CONSOLIDATE_WORKERS) as pool:
+        for user_id, points in sorted(users.items()):
+            report = consolidate_user(memory, points, args.dry_run, pool)
+            before += report["before"]
+            after += report["after"]
+            print(
+                f"👤 {user_id}: {report['before']} → {report['after']} memories "
+                f"({report['merged']} merged, {report['redundant']} redundant/superseded removed, {report['over_cap']} over the cap of {CONSOLIDATE_MAX_MEMORIES}"
+                + (f", {report['failed']} clusters failed" if report['failed'] else "") + ")"
+            )
+
+    print(f"{'🔎 Dry run' if args.dry_run else '✅ Consolidated'}: {len(users)} users, {before} → {after} memories")
@@ -0,0 +1,191 @@
+# Per-user hot-memory cache in front of mem0 search
+#
+# A chat session keeps asking about the same few memories, so each user gets a
+# small in-process hot set: the memories recent searches returned and the ones
+# recent writes added/updated. A query whose embedding is close enough (cosine
+# similarity >= threshold) to a recent query is answered from the hot set
+# without a Qdrant round trip. Everything else falls through to memory.search.
+#
+# A hit returns about what the Qdrant search would: the closest recent query's
+# results, plus added/updated memories scoring at least as high as its lowest
+# result, cut to the limit. Added/updated memories carry the embedding mem0
+# computed for them and are ranked by their similarity to the query. Search
+# results come without vectors (fetching them would cost a round trip on every
+# miss), so they keep their score for that recent query, which is close to the
+# current one.
+#
+# Entries expire after a TTL and the least recently used memory is evicted when
+# a user's hot set is full.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HOT_MEMORY_THRESHOLD = float(os.getenv("HOT_MEMORY_THRESHOLD", 0.9))
+HOT_MEMORY_TTL = int(os.getenv("HOT_MEMORY_TTL", 600))
+HOT_MEMORY_SIZE = int(os.getenv("HOT_MEMORY_SIZE", 256))
+HOT_QUERY_SIZE = int(os.getenv("HOT_QUERY_SIZE", 32))
+
+def normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+# -------------------------
+# Embedding recorder
+# -------------------------
+class RecordingEmbedder:
+    # Wraps mem0's embedder: remembers the latest vectors so the query embedded for the
+    # cache check isn't embedded again by memory.search, and so the vectors mem0 computes
+    # for new/updated memories can be put in the hot set without another embedding call
+    def __init__(self, embedder, size: int = HOT_MEMORY_SIZE):
+        self.embedder = embedder
+        self.size = size
+        self.vectors = OrderedDict()
+        self.lock = threading.Lock()
+
+    def remember(self, key, vector):
+        with self.lock:
+            self.vectors[key] = vector
+            self.vectors.move_to_end(key)
+            while len(self.vectors) > self.size:
+                self.vectors.popitem(last=False)
+
+    def recall(self, key):
+        with self.lock:
+            return self.vectors.get(key)
+
+    def embed(self, text, memory_action=None):
+        vector = self.recall((memory_action, text))
+        if vector is None:
+            vector = self.embedder.embed(text, memory_action)
+            self.remember((memory_action, text), vector)
+        return vector
+
+    def __getattr__(self, name):
+        return getattr(self.embedder, name)
+
+# -------------------------
+# Hot set
+# -------------------------
+class HotSet:
+    def __init__(self):
+        # memory id -> (result, vector or None, stored_at), in LRU order
+        self.memories = OrderedDict()
+        # Recent queries answered by Qdrant: (vector, stored_at, limit, result ids, lowest score)
+        self.queries = []
+
+class HotMemoryCache:
+    def __init__(self, memory, threshold: float = HOT_MEMORY_THRESHOLD, ttl: int = HOT_MEMORY_TTL, size: int = HOT_MEMORY_SIZE):
+        self.memory = memory
+        self.threshold = threshold
+        self.ttl = ttl
+        self.size = size
+        self.lock = threading.Lock()
+        self.users = {}
+        self.counters = {}
+        self.embedder = RecordingEmbedder(memory.embedding_model)
+        memory.embedding_model = self.embedder
+
+    def hot_set(self, user_id: str) -> HotSet:
+        # Caller holds the lock; drops expired queries and memories first
+        hot = self.users.setdefault(user_id, HotSet())
+        cutoff = time.monotonic() - self.ttl
+        hot.queries = [query for query in hot.queries if query[1] >= cutoff]
+        for memory_id in [memory_id for memory_id, entry in hot.memories.items() if entry[2] < cutoff]:
+            del hot.memories[memory_id]
+        return hot
+
+    def put(self, hot: HotSet, result, vector):
+        hot.memories[result["id"]] = (result, None if vector is None else normalize(vector), time.monotonic())
+        hot.memories.move_to_end(result["id"])
+        while len(hot.memories) > self.size:
+            hot.memories.popitem(last=False)
+
+    def count(self, user_id: str, outcome: str):
+        counters = self.counters.setdefault(user_id, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def search(self, query: str, user_id: str, **kwargs):
+        vector = normalize(self.embedder.embed(query, "search"))
+        limit = kwargs.get("limit", 100)
+
+        with self.lock:
+            hot = self.hot_set(user_id)
+            # Stands in for this search: the closest recent query that asked for at least as many
+            # results and whose results are all still hot (none evicted or expired since)
+            near = [
+                (similarity, recent) for recent in hot.queries
+                if (similarity := float(vector @ recent[0])) >= self.threshold and recent[2] >= limit
+            ]
+            match = max(near, key=lambda candidate: candidate[0], default=(None, None))[1]
+            if match is not None and all(memory_id in hot.memories for memory_id in match[3]):
+                self.count(user_id, "hits")
+                _, _, _, result_ids, min_score = match
+                scored = []
+                for result, memory_vector, _ in hot.memories.values():
+                    if memory_vector is not None:
+                        result = dict(result, score=float(vector @ memory_vector))
+                        if result["id"] in result_ids or result["score"] >= min_score:
+                            scored.append(result)
+                    elif result["id"] in result_ids:
+                        scored.append(result)
+                ranked = sorted(scored, key=lambda result: result.get("score", 0.0), reverse=True)[:limit]
+                for result in ranked:
+                    hot.memories.move_to_end(result["id"])
+                return {"results": ranked}
+            self.count(user_id, "misses")
+
+        # The query vector is reused from the recorder, so this costs only the Qdrant search
+        results = self.memory.search(query=query, user_id=user_id, **kwargs)
+
+        with self.lock:
+            hot = self.hot_set(user_id)
+            found = results.get("results", [])
+            for result in found:
+                # Keeps the vector of a memory that is already hot
+                memory_vector = hot.memories[result["id"]][1] if result["id"] in hot.memories else None
+                self.put(hot, result, memory_vector)
+            # A search cut off at its limit skipped everything scoring below its last result;
+            # one that returned fewer got all of the user's memories
+            min_score = min(result.get("score", 0.0) for result in found) if len(found) >= limit else float("-inf")
+            hot.queries.append((vector, time.monotonic(), limit, {result["id"] for result in found}, min_score))
+            del hot.queries[:-HOT_QUERY_SIZE]
+        return results
+
+    def add(self, messages, user_id: str, **kwargs):
+        response = self.memory.add(messages=messages, user_id=user_id, **kwargs)
+
+        # Keep the hot set in line with what mem0 just wrote
+        with self.lock:
+            hot = self.hot_set(user_id)
+            for event in response.get("results", []):
+                if event.get("event") == "DELETE":
+                    hot.memories.pop(event["id"], None)
+                    # Qdrant would return another memory in its place, which isn't hot
+                    hot.queries = [recent for recent in hot.queries if event["id"] not in recent[3]]
+                elif event.get("event") in ("ADD", "UPDATE"):
+                    vector = self.embedder.recall(("add", event["memory"]))
+                    if vector is None:
+                        vector = self.embedder.recall(("update", event["memory"]))
+                    if vector is not None:
+                        self.put(hot, {"id": event["id"], "memory": event["memory"], "user_id": user_id}, vector)
+                    else:
+                        hot.memories.pop(event["id"], None)
+        return response
+
+    def stats(self):
+        with self.lock:
+            report = {}
+            for user_id, counters in self.counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                report[user_id] = dict(
+                    counters,
+                    hit_rate=round(counters["hits"] / lookups, 3) if lookups else 0.0,
+                    hot_memories=len(self.users.get(user_id, HotSet()).memories),
+                )
+            return report
@@ -4,6 +4,10 @@ import os
 from dotenv import load_dotenv
 from mem0 import Memory
 from openai import OpenAI
+import atexit
+from write_behind import WriteBehindMemory
+from hot_memory import HotMemoryCache
+from mem_config import config
 import json
 
 load_dotenv()
@@ -15,37 +19,23 @@ client = OpenAI(
   base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
 )
 
-config = {
-  "version": "v1.1",
-  "embedder": {
-    "provider": "gemini",
-    "config": { "api_key": GEMINI_API_KEY, "model": "gemini-embedding-001"}
+memory = Memory.from_config(config)
+# Searches close to a recent one are answered from the user's hot memories, without Qdrant
+hot_memory = HotMemoryCache(memory)
+# memory.add runs in the background; searches still see turns that aren't written yet
+writer = WriteBehindMemory(hot_memory)
 
-  },
-  "llm": {
-      "provider": "gemini",
-      "config": {
-          "model": "gemini-2.0-flash-001",
-          "temperature": 0.2,
-      }
-  },
-  "vector_store": {
-    "provider": "qdrant",
-    "config": {
-      "host": "localhost",
-      "port": 6333,
-      "collection_name": "mem0_gemini_768_v3",
-      "embedding_model_dims": 768
-    },
-  }
-}
+def shutdown():
+    # Pending writes are flushed when the chat exits (Ctrl+C / Ctrl+D)
+    writer.close()
+    print(f"🔥 Hot memory: {hot_memory.stats()}")
 
-memory = Memory.from_config(config)
+atexit.register(shutdown)
 
 while True:
     user_query = input("👉: ")
 
-    search_memory = memory.search(query=user_query, user_id="Dhanush")
+    search_memory = writer.search(query=user_query, user_id="Dhanush")
 
     memories = [
       f"ID: {mem.get('id')}, Memory: {mem.get('memory')}" for mem in search_memory.get("results")
@@ -77,20 +67,17 @@ while True:
         continue
 
     print("AI:", ai_response)
-    try:
-        memory.add(
-            user_id="Dhanush",
-            messages=[
-                {
-                    "role": "user",
-                    "content": user_query
-                },
-                {
-                    "role": "assistant",
-                    "content": ai_response
-                }
-            ]
-        )
-        print("Memory added")
-    except Exception as e:
-        print("Error adding memory:", e)
\ No newline at end of file
+    writer.add(
+        user_id="Dhanush",
+        messages=[
+            {
+                "role": "user",
+                "content": user_query
+            },
+            {
+                "role": "assistant",
+                "content": ai_response
+            }
+        ]
+    )
+    print("Memory queued")
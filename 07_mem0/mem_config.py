@@ -0,0 +1,33 @@
+# mem0 configuration shared by the chat (mem.py) and the consolidation job
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+config = {
+  "version": "v1.1",
+  "embedder": {
+    "provider": "gemini",
+    "config": { "api_key": GEMINI_API_KEY, "model": "gemini-embedding-001"}
+
+  },
+  "llm": {
+      "provider": "gemini",
+      "config": {
+          "model": "gemini-2.0-flash-001",
+          "temperature": 0.2,
+      }
+  },
+  "vector_store": {
+    "provider": "qdrant",
+    "config": {
+      "host": "localhost",
+      "port": 6333,
+      "collection_name": "mem0_gemini_768_v3",
+      "embedding_model_dims": 768
+    },
+  }
+}
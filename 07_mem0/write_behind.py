@@ -0,0 +1,100 @@
+# Write-behind queue for mem0
+#
+# memory.add runs an LLM extraction plus embeddings and upserts, which used to
+# block every chat turn. Turns are now queued and written by a background
+# thread instead: whatever has piled up while a write runs is sent as one
+# memory.add per user (one extraction call for several turns). The queue is
+# bounded, so a slow backend makes the chat wait instead of growing memory.
+#
+# Reads stay consistent: turns that are queued or still being written are
+# returned by search() next to the stored memories, until mem0 has them.
+
+import os
+import queue
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MEMORY_WRITE_QUEUE_SIZE = int(os.getenv("MEMORY_WRITE_QUEUE_SIZE", 32))
+MEMORY_WRITE_BATCH_SIZE = int(os.getenv("MEMORY_WRITE_BATCH_SIZE", 8))
+
+class WriteBehindMemory:
+    def __init__(self, memory, queue_size: int = MEMORY_WRITE_QUEUE_SIZE, batch_size: int = MEMORY_WRITE_BATCH_SIZE):
+        self.memory = memory
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Turns not yet written to mem0 (queued or in flight), in order
+        self.pending = []
+        self.lock = threading.Lock()
+        self.counters = {"turns": 0, "writes": 0, "errors": 0}
+        self.worker = threading.Thread(target=self.run, name="memory-writer", daemon=True)
+        self.worker.start()
+
+    def add(self, messages, user_id: str):
+        turn = (user_id, messages)
+        with self.lock:
+            self.pending.append(turn)
+        # Blocks only while the queue is full
+        self.queue.put(turn)
+
+    def search(self, query: str, user_id: str, **kwargs):
+        results = self.memory.search(query=query, user_id=user_id, **kwargs)
+        with self.lock:
+            pending = [messages for pending_user, messages in self.pending if pending_user == user_id]
+        # Not extracted into memories yet, so the raw user messages stand in for them
+        for messages in pending:
+            for message in messages:
+                if message["role"] == "user":
+                    results["results"].append({"id": "pending", "memory": message["content"], "pending": True})
+        return results
+
+    # -------------------------
+    # Background writer
+    # -------------------------
+    def next_batch(self):
+        batch = [self.queue.get()]
+        while batch[-1] is not None and len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            stop = batch[-1] is None
+            turns = [turn for turn in batch if turn is not None]
+
+            by_user = {}
+            for user_id, messages in turns:
+                by_user.setdefault(user_id, []).extend(messages)
+            for user_id, messages in by_user.items():
+                try:
+                    self.memory.add(messages=messages, user_id=user_id)
+                    self.counters["writes"] += 1
+                except Exception as e:
+                    self.counters["errors"] += 1
+                    print("Error adding memory:", e)
+
+            with self.lock:
+                for turn in turns:
+                    self.pending.remove(turn)
+            self.counters["turns"] += len(turns)
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        # Waits until every queued turn has been written
+        self.queue.join()
+
+    def close(self):
+        # Writes what is still queued, then stops the writer
+        self.queue.put(None)
+        self.worker.join()
+
+    def stats(self):
+        return dict(self.counters, pending=len(self.pending))
@@ -0,0 +1,85 @@
+# Batch mode: run the tweet workflow for many topics at once
+#
+# Topics are read one per line. All runs go through the compiled graph with
+# abatch_as_completed, so at most --concurrency runs are in flight and every
+# result is appended to the output JSONL file as soon as its run finishes.
+# LLM calls of all runs share main.py's rate limiter, so the batch stays under
+# the provider's request rate instead of failing with 429s.
+#
+# Run with: python batch.py topics.txt tweets.jsonl [--concurrency 32] [--log json]
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+import main as workflow
+from checkpointer import aresume_input
+
+def read_topics(path):
+  with open(path) as f:
+    return [line.strip() for line in f if line.strip()]
+
+def thread_id(topic: str, max_iterations: int, repeat: int) -> str:
+  # The fan-out mode runs a different graph, so its checkpoints get their own threads too;
+  # a topic listed twice gets one thread per occurrence
+  key = f"{topic}\0{max_iterations}\0{workflow.FAN_OUT}\0{repeat}"
+  return f"tweets-{hashlib.sha256(key.encode()).hexdigest()[:32]}"
+
+async def run(topics, output_path, concurrency: int, max_iterations: int):
+  # The sequential graph's nodes are synchronous, so ainvoke runs them in the loop's default
+  # executor; one thread per run in flight (the fan-out round is async and needs none)
+  asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+
+  # Thread ids derived from the run's inputs: with a checkpointer, re-running the batch resumes
+  # unfinished topics, and a different topics file never resumes another topic's run
+  configs, seen = [], {}
+  for topic in topics:
+    seen[topic] = seen.get(topic, -1) + 1
+    configs.append({"configurable": {"thread_id": thread_id(topic, max_iterations, seen[topic])}, "max_concurrency": concurrency})
+  inputs = await asyncio.gather(*(
+    aresume_input(workflow.model, config, {"topic": topic, "iterations": 0, "max_iterations": max_iterations})
+    for topic, config in zip(topics, configs)
+  ))
+
+  started = time.perf_counter()
+  approved = failed = saved = 0
+  latencies = []
+  with open(output_path, "a") as out:
+    async for index, result in workflow.model.abatch_as_completed(inputs, configs, return_exceptions=True):
+      record = {"topic": topics[index], "latency_ms": round((time.perf_counter() - started) * 1000)}
+      if isinstance(result, Exception):
+        failed += 1
+        record["error"] = str(result)
+      else:
+        approved += result.get("evaluation") == "approved"
+        saved += result.get("llm_calls_saved", 0)
+        latencies.append(record["latency_ms"])
+        record.update(tweet=result.get("tweet"), evaluation=result.get("evaluation"), iterations=result.get("iterations"))
+      out.write(json.dumps(record, ensure_ascii=False) + "\n")
+      out.flush()
+
+  elapsed = time.perf_counter() - started
+  print(f"✅ {len(topics)} topics in {elapsed:.1f}s: {approved} approved, {failed} failed")
+  print(f"🧮 Evaluator calls saved by local validation: {saved}")
+  if len(latencies) >= 2:
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"⏱️  Finished after p50 {cuts[49] / 1000:.1f}s  p90 {cuts[89] / 1000:.1f}s")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Generate tweets for a file of topics")
+  parser.add_argument("input", help="text file with one topic per line")
+  parser.add_argument("output", help="JSONL file results are appended to")
+  parser.add_argument("--concurrency", type=int, default=32, help="runs in flight at once")
+  parser.add_argument("--max-iterations", type=int, default=3)
+  parser.add_argument("--log", choices=["pretty", "json", "off"], default="off", help="node logging (default: off)")
+  args = parser.parse_args()
+
+  workflow.LOG_MODE = args.log
+  if args.log == "json":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+  asyncio.run(run(read_topics(args.input), args.output, args.concurrency, args.max_iterations))
@@ -1,18 +1,43 @@
 from typing import TypedDict, Literal, Annotated
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Command
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.rate_limiters import InMemoryRateLimiter
 from dotenv import load_dotenv
+import asyncio
+import json
+import logging
 import os
 import operator
+import uuid
+from checkpointer import make_checkpointer, resume_input
+# Local validation: the evaluator's mechanical auto-reject rules, checked without an LLM call
+from validator import rejection_feedback, tweet_problems
 
 # Load .env from root directory
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# Candidate tweets written and evaluated in parallel per round (1 = the sequential loop)
+FAN_OUT = int(os.getenv("FAN_OUT", 1))
+
+# Node logging: "pretty" console banners, "json" one structured line per event, or "off"
+LOG_MODE = os.getenv("LOG_MODE", "pretty")
+logger = logging.getLogger("tweets")
+
+def log_event(event: str, **fields):
+  # The JSON is only built when it will be written
+  if LOG_MODE == "json" and logger.isEnabledFor(logging.INFO):
+    logger.info(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+# Shared by all three LLMs (same provider quota); calls wait for a token instead of hitting 429s
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", 5))
+rate_limiter = InMemoryRateLimiter(requests_per_second=LLM_REQUESTS_PER_SECOND, check_every_n_seconds=0.05, max_bucket_size=max(1, LLM_REQUESTS_PER_SECOND))
+
 # State of the workflow
 class TweetState(TypedDict):
   topic: str
@@ -25,34 +50,30 @@ class TweetState(TypedDict):
   tweet_history: Annotated[list[str], operator.add]
   feedback_history: Annotated[list[str], operator.add]
 
+  # Evaluator calls skipped because the local validator already rejected the tweet
+  llm_calls_saved: Annotated[int, operator.add]
+
 # LLMs for the workflow
 
-generative_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GEMINI_API_KEY)
-evaluator_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GEMINI_API_KEY)
-optimizer_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GEMINI_API_KEY)
+generative_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GEMINI_API_KEY, rate_limiter=rate_limiter)
+evaluator_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GEMINI_API_KEY, rate_limiter=rate_limiter)
+optimizer_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GEMINI_API_KEY, rate_limiter=rate_limiter)
 
 # structured output for the evaluator_llm
 class TweetEvaluation(BaseModel):
     evaluation: Literal["approved", "needs_improvement"] = Field(..., description="Final evaluation result.")
     feedback: str = Field(..., description="feedback for the tweet.")
+    score: int = Field(0, ge=0, le=10, description="Overall quality from 0 (worst) to 10 (best).")
 
 # Create a Pydantic output parser
 output_parser = PydanticOutputParser(pydantic_object=TweetEvaluation)
 graph = StateGraph(TweetState)
 
-# Methods used in the workflow
-def generate_tweet(state: TweetState) -> TweetState:
-  print("\n" + "="*70)
-  print("📝 STEP 1: GENERATING TWEET")
-  print("="*70)
-  print(f"Topic: {state['topic']}")
-  print(f"Iteration: {state['iterations'] + 1}/{state['max_iterations']}")
-  print("-"*70)
-  
-  # prompt
-  messages = [
+# Prompts (shared by the sequential and the fan-out nodes)
+def generate_messages(topic: str):
+  return [
     SystemMessage(content="You are a funny and clever Twitter/ X influencer."),
-    HumanMessage(content=f"""Generate a tweet about {state['topic']}
+    HumanMessage(content=f"""Generate a tweet about {topic}
     
     Rules:
     - The tweet should be 280 characters or less.
@@ -62,28 +83,14 @@ def generate_tweet(state: TweetState) -> TweetState:
     - The tweet should be relevant to the topic.
     """)
   ]
-  # send generator_llm
-  response = generative_llm.invoke(messages)
-  print(f"🤖 Generated Tweet:\n{response.content}")
-  print("-"*70)
-
-  # return response
-  return {"tweet": response.content}
 
-def evaluate_tweet(state: TweetState) -> TweetState:
-  print("\n" + "="*70)
-  print("🔍 STEP 2: EVALUATING TWEET")
-  print("="*70)
-  print(f"Tweet to evaluate:\n{state['tweet']}")
-  print("-"*70)
-  
-  # prompt
-  messages = [
+def evaluate_messages(tweet: str):
+  return [
     SystemMessage(content="You are a ruthless, no-laugh-given Twitter critic. You evaluate tweets based on humor, originality, virality, and tweet format."),
     HumanMessage(content=f"""
       Evaluate the following tweet:
 
-      Tweet: "{state['tweet']}"
+      Tweet: "{tweet}"
 
       Use the criteria below to evaluate the tweet:
 
@@ -102,18 +109,69 @@ def evaluate_tweet(state: TweetState) -> TweetState:
       ### Respond ONLY in structured format:
       - evaluation: "approved" or "needs_improvement"  
       - feedback: One paragraph explaining the strengths and weaknesses 
+      - score: Overall quality from 0 (worst) to 10 (best)
       
       {output_parser.get_format_instructions()}
       """)
-      ]
+  ]
+
+def optimize_messages(topic: str, tweet: str, feedback: str):
+  return [
+    SystemMessage(content="You punch up tweets for virality and humor based on given feedback."),
+    HumanMessage(content=f"""
+    Improve the tweet based on this feedback:
+    "{feedback}"
+
+    Topic: "{topic}"
+    Original Tweet:
+    {tweet}
+
+    Re-write it as a short, viral-worthy tweet. Avoid Q&A style and stay under 280 characters.
+    """)
+  ]
+
+# Methods used in the workflow
+def generate_tweet(state: TweetState) -> TweetState:
+  if LOG_MODE == "pretty":
+    print("\n" + "="*70)
+    print("📝 STEP 1: GENERATING TWEET")
+    print("="*70)
+    print(f"Topic: {state['topic']}")
+    print(f"Iteration: {state['iterations'] + 1}/{state['max_iterations']}")
+    print("-"*70)
+  
+  # prompt
+  messages = generate_messages(state['topic'])
+  # send generator_llm
+  response = generative_llm.invoke(messages)
+  if LOG_MODE == "pretty":
+    print(f"🤖 Generated Tweet:\n{response.content}")
+    print("-"*70)
+  log_event("generated", topic=state['topic'], chars=len(response.content))
+
+  # return response
+  return {"tweet": response.content}
+
+def evaluate_tweet(state: TweetState) -> TweetState:
+  if LOG_MODE == "pretty":
+    print("\n" + "="*70)
+    print("🔍 STEP 2: EVALUATING TWEET")
+    print("="*70)
+    print(f"Tweet to evaluate:\n{state['tweet']}")
+    print("-"*70)
+  
+  # prompt
+  messages = evaluate_messages(state['tweet'])
 
   # evaluate the generated tweet and return the evaluation with feedback
   response = evaluator_llm.invoke(messages)
   parsed_response = output_parser.parse(response.content)
   
-  print(f"📊 Evaluation Result: {parsed_response.evaluation.upper()}")
-  print(f"💬 Feedback:\n{parsed_response.feedback}")
-  print("-"*70)
+  if LOG_MODE == "pretty":
+    print(f"📊 Evaluation Result: {parsed_response.evaluation.upper()}")
+    print(f"💬 Feedback:\n{parsed_response.feedback}")
+    print("-"*70)
+  log_event("evaluated", topic=state['topic'], evaluation=parsed_response.evaluation, score=parsed_response.score)
 
   # return response
   return {
@@ -122,66 +180,95 @@ def evaluate_tweet(state: TweetState) -> TweetState:
   }
 
 def optimize_tweet(state: TweetState) -> TweetState:
-  print("\n" + "="*70)
-  print("⚡ STEP 3: OPTIMIZING TWEET")
-  print("="*70)
-  print(f"Current iteration: {state['iterations'] + 1}/{state['max_iterations']}")
-  print(f"Previous tweet:\n{state['tweet']}")
-  print(f"\nFeedback received:\n{state['feedback']}")
-  print("-"*70)
+  if LOG_MODE == "pretty":
+    print("\n" + "="*70)
+    print("⚡ STEP 3: OPTIMIZING TWEET")
+    print("="*70)
+    print(f"Current iteration: {state['iterations'] + 1}/{state['max_iterations']}")
+    print(f"Previous tweet:\n{state['tweet']}")
+    print(f"\nFeedback received:\n{state['feedback']}")
+    print("-"*70)
   
   # prompt
-  messages = [
-    SystemMessage(content="You punch up tweets for virality and humor based on given feedback."),
-    HumanMessage(content=f"""
-    Improve the tweet based on this feedback:
-    "{state['feedback']}"
-
-    Topic: "{state['topic']}"
-    Original Tweet:
-    {state['tweet']}
-
-    Re-write it as a short, viral-worthy tweet. Avoid Q&A style and stay under 280 characters.
-    """)
-  ]
+  messages = optimize_messages(state['topic'], state['tweet'], state['feedback'])
 
   response = optimizer_llm.invoke(messages).content
   iterations = state['iterations'] + 1
   
-  print(f"✨ Optimized Tweet:\n{response}")
-  print("-"*70)
-  print("🔄 Looping back to evaluation...")
+  if LOG_MODE == "pretty":
+    print(f"✨ Optimized Tweet:\n{response}")
+    print("-"*70)
+    print("🔄 Looping back to evaluation...")
+  log_event("optimized", topic=state['topic'], iteration=iterations, chars=len(response))
 
   return {'tweet': response, 'iterations': iterations, 'tweet_history': [response]}
 
 # route evaluator 
 def route_evaluator(state: TweetState) -> Literal["optimize", "end"]:
-  print("\n" + "="*70)
-  print("🚦 ROUTING DECISION")
-  print("="*70)
+  log_event("routed", topic=state['topic'], evaluation=state['evaluation'], iteration=state['iterations'])
+  if LOG_MODE == "pretty":
+    print("\n" + "="*70)
+    print("🚦 ROUTING DECISION")
+    print("="*70)
   
   if state['evaluation'] == "approved":
-    print("✅ Tweet APPROVED! Moving to final output...")
-    print("="*70 + "\n")
+    if LOG_MODE == "pretty":
+      print("✅ Tweet APPROVED! Moving to final output...")
+      print("="*70 + "\n")
     return "end"
   elif state['iterations'] >= state['max_iterations']:
-    print(f"⏱️  Max iterations ({state['max_iterations']}) reached. Moving to final output...")
-    print("="*70 + "\n")
+    if LOG_MODE == "pretty":
+      print(f"⏱️  Max iterations ({state['max_iterations']}) reached. Moving to final output...")
+      print("="*70 + "\n")
     return "end"
   else:
-    print(f"🔄 Tweet needs improvement. Iteration {state['iterations']}/{state['max_iterations']}")
-    print("   → Routing to OPTIMIZE step...")
-    print("="*70)
+    if LOG_MODE == "pretty":
+      print(f"🔄 Tweet needs improvement. Iteration {state['iterations']}/{state['max_iterations']}")
+      print("   → Routing to OPTIMIZE step...")
+      print("="*70)
     return "optimize"
 
+def validate_tweet(state: TweetState) -> TweetState:
+  problems = tweet_problems(state['tweet'])
+  if not problems:
+    if LOG_MODE == "pretty":
+      print("✅ Local checks passed → evaluating with the LLM")
+    return {}
+
+  feedback = rejection_feedback(problems)
+  if LOG_MODE == "pretty":
+    print(f"🚫 Rejected locally, no evaluator call: {feedback}")
+  log_event("rejected_locally", topic=state['topic'], problems=problems)
+  return {
+    'evaluation': "needs_improvement",
+    'feedback': feedback,
+    'feedback_history': [feedback],
+    'llm_calls_saved': 1,
+  }
+
+def route_validator(state: TweetState) -> Literal["evaluate", "optimize", "end"]:
+  # Rejected tweets skip the evaluator and are routed like a "needs_improvement" verdict
+  return "evaluate" if not tweet_problems(state['tweet']) else route_evaluator(state)
+
 # Nodes for the workflow
 graph.add_node("generate", generate_tweet)
+graph.add_node("validate", validate_tweet)
 graph.add_node("evaluate", evaluate_tweet)
 graph.add_node("optimize", optimize_tweet)
 
 # Edges for the workflow
 graph.add_edge(START, "generate")
-graph.add_edge("generate", "evaluate")
+graph.add_edge("generate", "validate")
+
+graph.add_conditional_edges(
+  "validate",
+  route_validator,
+  {
+    "evaluate": "evaluate",
+    "optimize": "optimize",
+    "end": END
+  }
+)
 
 # add conditional edge from evaluate (removed unconditional edge - can't have both)
 graph.add_conditional_edges(
@@ -193,29 +280,118 @@ graph.add_conditional_edges(
   }
 )
 
-# add loop edge from optimize back to evaluate (removed optimize->END edge - can't have multiple unconditional edges)
-graph.add_edge("optimize", "evaluate")
+# add loop edge from optimize back to validation (removed optimize->END edge - can't have multiple unconditional edges)
+graph.add_edge("optimize", "validate")
+
+# -------------------------
+# Fan-out mode (FAN_OUT > 1)
+# -------------------------
+# Every round writes FAN_OUT candidates concurrently and evaluates each one as
+# soon as it is written. The first approved candidate ends the round, and the
+# still-running ones are cancelled, so a round takes as long as its first
+# approval rather than its slowest candidate. Without an approval, the best
+# candidate is optimized into FAN_OUT concurrent rewrites next round.
+async def write_and_evaluate(topic: str, best: dict | None) -> dict:
+  # First round: a fresh tweet; later rounds: a rewrite of the best candidate so far
+  if best is None:
+    tweet = (await generative_llm.ainvoke(generate_messages(topic))).content
+    if LOG_MODE == "pretty":
+      print(f"📝 Candidate:\n{tweet}\n")
+    log_event("generated", topic=topic, chars=len(tweet))
+  else:
+    tweet = (await optimizer_llm.ainvoke(optimize_messages(topic, best['tweet'], best['feedback']))).content
+    if LOG_MODE == "pretty":
+      print(f"⚡ Rewrite:\n{tweet}\n")
+    log_event("optimized", topic=topic, chars=len(tweet))
+
+  # Candidates breaking the mechanical rules are rejected locally, without an evaluator call
+  problems = tweet_problems(tweet)
+  if problems:
+    if LOG_MODE == "pretty":
+      print(f"🚫 Rejected locally: {tweet[:60]!r}")
+    log_event("rejected_locally", topic=topic, problems=problems)
+    return {"tweet": tweet, "evaluation": "needs_improvement", "feedback": rejection_feedback(problems), "score": 0, "local": True}
+
+  parsed_response = output_parser.parse((await evaluator_llm.ainvoke(evaluate_messages(tweet))).content)
+  if LOG_MODE == "pretty":
+    print(f"🔍 {parsed_response.evaluation.upper()} ({parsed_response.score}/10): {tweet[:60]!r}")
+  log_event("evaluated", topic=topic, evaluation=parsed_response.evaluation, score=parsed_response.score)
+  return {"tweet": tweet, **parsed_response.model_dump()}
+
+async def fan_out_round(state: TweetState) -> Command:
+  best = None if state['iterations'] == 0 else {"tweet": state['tweet'], "feedback": state['feedback']}
+  pending = {asyncio.create_task(write_and_evaluate(state['topic'], best)) for _ in range(FAN_OUT)}
+  evaluations = []
+  try:
+    while pending:
+      done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+      evaluations.extend(task.result() for task in done)
+      if any(e['evaluation'] == "approved" for e in evaluations):
+        break
+  finally:
+    # Stops the LLM calls of candidates that can no longer win
+    for task in pending:
+      task.cancel()
+
+  # Approved candidates win over any score; ties go to the higher score
+  best = max(evaluations, key=lambda e: (e['evaluation'] == "approved", e['score']))
+  update = {
+    'tweet': best['tweet'],
+    'evaluation': best['evaluation'],
+    'feedback': best['feedback'],
+    'tweet_history': [e['tweet'] for e in evaluations],
+    'feedback_history': [best['feedback']],
+    'llm_calls_saved': sum(1 for e in evaluations if e.get('local')),
+  }
+  if LOG_MODE == "pretty":
+    print(f"🚦 Best of {len(evaluations)}: {best['evaluation'].upper()} ({best['score']}/10)")
+  log_event("selected", topic=state['topic'], candidates=len(evaluations), cancelled=len(pending), evaluation=best['evaluation'], score=best['score'], iteration=state['iterations'])
+
+  if best['evaluation'] == "approved" or state['iterations'] >= state['max_iterations']:
+    return Command(update=update, goto=END)
+  update['iterations'] = state['iterations'] + 1
+  return Command(update=update, goto="round")
+
+fan_out_graph = StateGraph(TweetState)
+fan_out_graph.add_node("round", fan_out_round, destinations=("round", END))
+fan_out_graph.add_edge(START, "round")
 
 # Add the graph to the registry
-model = graph.compile()
-
-# Run the workflow
-print("\n" + "="*70)
-print("🚀 STARTING TWEET GENERATION WORKFLOW")
-print("="*70)
-print("Topic: AI")
-print("Max Iterations: 3")
-print("="*70 + "\n")
-
-result = model.invoke({"topic": "AI", 'iterations': 0,"max_iterations": 3})
-
-print("\n" + "="*70)
-print("🎉 WORKFLOW COMPLETED")
-print("="*70)
-print("📌 FINAL APPROVED TWEET:")
-print("-"*70)
-print(result.get("tweet"))
-print("-"*70)
-print(f"📊 Total Iterations: {result.get('iterations')}")
-print(f"✅ Final Status: {result.get('evaluation')}")
-print("="*70 + "\n")
\ No newline at end of file
+# With CHECKPOINTER=sqlite|redis every completed node is saved, so a crashed run resumes by thread id
+model = (fan_out_graph if FAN_OUT > 1 else graph).compile(checkpointer=make_checkpointer())
+
+# Run the workflow (see batch.py for many topics at once)
+def main():
+  if LOG_MODE == "json":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+  print("\n" + "="*70)
+  print("🚀 STARTING TWEET GENERATION WORKFLOW")
+  print("="*70)
+  print("Topic: AI")
+  print("Max Iterations: 3")
+  print(f"Candidates per round: {FAN_OUT}")
+  print("="*70 + "\n")
+
+  # Set THREAD_ID to the id of a crashed run to continue it from its last completed node
+  thread_id = os.getenv("THREAD_ID") or uuid.uuid4().hex
+  config = {"configurable": {"thread_id": thread_id}}
+  print(f"🧵 Thread: {thread_id}")
+
+  # ainvoke: the fan-out round is an async node (the sequential nodes run in a worker thread)
+  result = asyncio.run(model.ainvoke(resume_input(model, config, {"topic": "AI", 'iterations': 0,"max_iterations": 3}), config))
+
+  print("\n" + "="*70)
+  print("🎉 WORKFLOW COMPLETED")
+  print("="*70)
+  print("📌 FINAL APPROVED TWEET:")
+  print("-"*70)
+  print(result.get("tweet"))
+  print("-"*70)
+  print(f"📊 Total Iterations: {result.get('iterations')}")
+  print(f"✅ Final Status: {result.get('evaluation')}")
+  print(f"🧮 Evaluator calls saved by local validation: {result.get('llm_calls_saved', 0)}")
+  print("="*70 + "\n")
+
+if __name__ == "__main__":
+  main()
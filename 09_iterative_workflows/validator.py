@@ -0,0 +1,65 @@
+# Local tweet validation: the evaluator's mechanical auto-reject rules, checked without an LLM call
+#
+# Only clear-cut cases are rejected here: tweets over the length limit, and
+# question-answer jokes where the question is followed by a real answer
+# clause (or the explicit "Q: ... A: ..." form). A question that only trails
+# off into hashtags, mentions, emoji or a link is an ordinary tweet, and
+# anything borderline is left to the LLM evaluator.
+#
+# Check the rules against the example table with: python validator.py
+
+import re
+
+MAX_TWEET_LENGTH = 280
+
+# A tweet opening with a question: "Why did ...?", "Ever wondered ...?"
+QUESTION_START = re.compile(r"^\W*(why|what|how|when|who|where|which|did|do|does|is|are|can|ever)\b[^?]{0,200}\?", re.IGNORECASE)
+EXPLICIT_QA = re.compile(r"\bQ:.+\bA:", re.IGNORECASE | re.DOTALL)
+# Stripped before looking for an answer; emoji never count as words
+DECORATION = re.compile(r"https?://\S+|[#@]\w+")
+WORD = re.compile(r"[^\W\d_]+")
+# Words after the question that make it an answer rather than a tag line
+MIN_ANSWER_WORDS = 3
+
+def is_qa_format(tweet: str) -> bool:
+  if EXPLICIT_QA.search(tweet):
+    return True
+  question = QUESTION_START.match(tweet)
+  if not question:
+    return False
+  rest = DECORATION.sub(" ", tweet[question.end():])
+  # A follow-up question isn't an answer
+  if "?" in rest:
+    return False
+  return len(WORD.findall(rest)) >= MIN_ANSWER_WORDS
+
+def tweet_problems(tweet: str) -> list[str]:
+  problems = []
+  if len(tweet) > MAX_TWEET_LENGTH:
+    problems.append(f"It is {len(tweet)} characters long; cut it to {MAX_TWEET_LENGTH} characters or less.")
+  if is_qa_format(tweet):
+    problems.append("It is written in question-answer format; rewrite it as a single punchy statement.")
+  return problems
+
+def rejection_feedback(problems: list[str]) -> str:
+  return "Auto-rejected before evaluation. " + " ".join(problems)
+
+# (tweet, rejected as Q&A locally)
+QA_EXAMPLES = [
+  ("Why did the developer go broke? Because he used up all his cache.", True),
+  ("What do you call a programmer who works out? A fit-tech enthusiast, obviously.", True),
+  ("Q: How many devs does it take to change a bulb? A: None, it's a hardware problem.", True),
+  ("How does AI cook dinner? It follows the recipe one token at a time 🍝 #AI", True),
+  ("Is it just me, or does my code only work on Fridays? #devlife", False),
+  ("Do you ever talk to ChatGPT nicer than to your coworkers? 😅", False),
+  ("Who else refreshes the build page like it owes them money? https://example.com @ci", False),
+  ("What if the bug was the friends we made along the way? Or is it just me?", False),
+  ("My code works and I have no idea why. Shipping it before it changes its mind.", False),
+]
+
+if __name__ == "__main__":
+  failures = [(tweet, expected) for tweet, expected in QA_EXAMPLES if is_qa_format(tweet) != expected]
+  for tweet, expected in failures:
+    print(f"❌ expected {'rejected' if expected else 'accepted'}: {tweet}")
+  print(f"{'✅' if not failures else '❌'} {len(QA_EXAMPLES) - len(failures)}/{len(QA_EXAMPLES)} Q&A examples as expected")
+  raise SystemExit(1 if failures else 0)
@@ -0,0 +1,114 @@
+# Semantic answer cache for the RAG graph
+#
+# Remembers (query embedding, answer) pairs. A new query whose embedding is
+# close enough (cosine similarity >= threshold) to one answered before gets the
+# cached answer, skipping retrieve + generate. Entries expire after a TTL and
+# the least recently used one is evicted when the cache is full.
+#
+# Answers are only valid for the collection they were generated from, so
+# ingestion bumps a per-collection version marker and the cache empties itself
+# as soon as it sees the version change.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 3600))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 1024))
+COLLECTION_VERSION_DIR = os.getenv("COLLECTION_VERSION_DIR", ".collection_versions")
+
+# -------------------------
+# Collection versions
+# -------------------------
+def collection_version(collection_name: str) -> str:
+    marker = Path(COLLECTION_VERSION_DIR) / collection_name
+    return marker.read_text() if marker.exists() else ""
+
+def bump_collection_version(collection_name: str):
+    # Called after (re-)ingestion; invalidates every cached answer for the collection
+    marker = Path(COLLECTION_VERSION_DIR) / collection_name
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    marker.write_text(str(time.time_ns()))
+
+# -------------------------
+# Cache
+# -------------------------
+class SemanticAnswerCache:
+    def __init__(self, collection_name: str, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: int = ANSWER_CACHE_TTL, size: int = ANSWER_CACHE_SIZE):
+        self.collection_name = collection_name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.size = size
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+        self.version = collection_version(collection_name)
+
+        # One row per slot; entries maps slot -> (answer, stored_at) in LRU order
+        self.matrix = None
+        self.occupied = np.zeros(size, dtype=bool)
+        self.entries = OrderedDict()
+
+    def clear(self):
+        self.occupied[:] = False
+        self.entries.clear()
+
+    def refresh(self):
+        version = collection_version(self.collection_name)
+        if version != self.version:
+            self.version = version
+            self.clear()
+
+        expired = [slot for slot, (_, stored_at) in self.entries.items() if time.time() - stored_at > self.ttl]
+        for slot in expired:
+            del self.entries[slot]
+            self.occupied[slot] = False
+
+    @staticmethod
+    def normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1)
+
+    def lookup(self, vector):
+        """Returns the cached answer of the most similar past query, or None."""
+        with self.lock:
+            self.refresh()
+            if not self.entries:
+                self.counters["misses"] += 1
+                return None
+
+            similarities = self.matrix @ self.normalize(vector)
+            similarities[~self.occupied] = -np.inf
+            slot = int(np.argmax(similarities))
+            if similarities[slot] < self.threshold:
+                self.counters["misses"] += 1
+                return None
+
+            self.entries.move_to_end(slot)
+            self.counters["hits"] += 1
+            return self.entries[slot][0]
+
+    def store(self, vector, answer: str):
+        with self.lock:
+            self.refresh()
+            vector = self.normalize(vector)
+            if self.matrix is None:
+                self.matrix = np.zeros((self.size, len(vector)), dtype=np.float32)
+
+            if len(self.entries) >= self.size:
+                slot, _ = self.entries.popitem(last=False)
+            else:
+                slot = int(np.argmin(self.occupied))
+            self.matrix[slot] = vector
+            self.occupied[slot] = True
+            self.entries[slot] = (answer, time.time())
+
+    def stats(self) -> dict:
+        total = self.counters["hits"] + self.counters["misses"]
+        return {**self.counters, "entries": len(self.entries), "hit_rate": round(self.counters["hits"] / total, 3) if total else 0.0}
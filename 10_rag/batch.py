@@ -0,0 +1,149 @@
+# Batch mode: run the RAG graph over a JSONL file of questions
+#
+# Input lines look like {"id": "q1", "query": "...", "tenant": "acme"}
+# ("id" and "tenant" are optional).
+# Query embeddings are requested in batches across questions up front, so
+# the graph's retriever finds them in the embedding cache. Questions then run
+# through the compiled app concurrently, and every result is appended to the
+# output file as soon as it is done, with its latency.
+#
+# Run with: python batch.py questions.jsonl answers.jsonl [--concurrency 16]
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import time
+from graph import app, embeddings, run_config
+from checkpointer import aresume_input
+from tenancy import DEFAULT_TENANT
+
+# Queries embedded per request
+QUERY_EMBED_BATCH = int(os.getenv("QUERY_EMBED_BATCH", 100))
+MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", 5))
+MAX_BACKOFF = 60
+
+def is_rate_limited(error: Exception) -> bool:
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message
+
+class RateLimitGate:
+    """Shared back-off: once any call is rate limited, every caller waits until the cool-down ends."""
+
+    def __init__(self):
+        self.resume_at = 0.0
+
+    async def wait(self):
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def cool_down(self, seconds: float):
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+gate = RateLimitGate()
+
+async def with_retries(call):
+    for attempt in range(MAX_RETRIES + 1):
+        await gate.wait()
+        try:
+            return await call()
+        except Exception as error:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = min(MAX_BACKOFF, 2 ** attempt) + random.random()
+            if is_rate_limited(error):
+                gate.cool_down(delay)
+            else:
+                await asyncio.sleep(delay)
+
+def read_questions(path):
+    seen = {}
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                item = json.loads(line)
+                tenant_id = item.get("tenant", DEFAULT_TENANT)
+                # A question asked twice in one file gets its own thread for each time
+                repeat = seen[tenant_id, item["query"]] = seen.get((tenant_id, item["query"]), -1) + 1
+                yield {"id": item.get("id", number), "query": item["query"], "tenant_id": tenant_id, "repeat": repeat}
+
+async def produce(path, queue: asyncio.Queue, workers: int):
+    batch = []
+    for item in read_questions(path):
+        batch.append(item)
+        if len(batch) == QUERY_EMBED_BATCH:
+            await enqueue_batch(batch, queue)
+            batch = []
+    if batch:
+        await enqueue_batch(batch, queue)
+    for _ in range(workers):
+        await queue.put(None)
+
+async def enqueue_batch(batch, queue: asyncio.Queue):
+    # One embedding request for the whole batch; retriever.invoke then hits the cache
+    queries = [item["query"] for item in batch]
+    try:
+        await with_retries(lambda: embeddings.aembed_queries(queries, task_type="RETRIEVAL_QUERY"))
+    except Exception as error:
+        print(f"⚠️  Batch query embedding failed, queries will be embedded one by one: {error}")
+    for item in batch:
+        await queue.put(item)
+
+async def answer(item):
+    # One thread per (tenant, question): with a checkpointer, a retry (or a re-run of the batch)
+    # continues the question from its last completed node. Keyed by content, not the id/line
+    # number, so another input file never resumes a different question's run
+    key = hashlib.sha256(f"{item['tenant_id']}\0{item['query']}\0{item['repeat']}".encode()).hexdigest()[:32]
+    config = run_config(f"batch-{key}")
+    state = await aresume_input(app, config, {"query": item["query"], "tenant_id": item["tenant_id"]})
+    return await app.ainvoke(state, config)
+
+async def work(queue: asyncio.Queue, out, latencies: list, errors: list):
+    while (item := await queue.get()) is not None:
+        started = time.perf_counter()
+        record = {"id": item["id"], "query": item["query"], "answer": None, "error": None}
+        try:
+            result = await with_retries(lambda: answer(item))
+            record["answer"] = result["answer"]
+        except Exception as error:
+            record["error"] = str(error)
+            errors.append(item["id"])
+        record["latency_ms"] = round((time.perf_counter() - started) * 1000)
+        latencies.append(record["latency_ms"])
+
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        if len(latencies) % 100 == 0:
+            print(f"📦 {len(latencies)} questions answered")
+
+async def main(input_path: str, output_path: str, concurrency: int):
+    # Bounded queue: questions are read (and embedded) only slightly ahead of the workers
+    queue = asyncio.Queue(maxsize=concurrency * 4)
+    latencies, errors = [], []
+    started = time.perf_counter()
+
+    with open(output_path, "a") as out:
+        await asyncio.gather(
+            produce(input_path, queue, concurrency),
+            *(work(queue, out, latencies, errors) for _ in range(concurrency)),
+        )
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {len(latencies)} questions in {elapsed:.1f}s ({len(errors)} failed)")
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100)
+        print(f"⏱️  Latency p50 {cuts[49]:.0f}ms  p90 {cuts[89]:.0f}ms  p99 {cuts[98]:.0f}ms")
+    print(f"🗃️  Embedding cache: {embeddings.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with the RAG graph")
+    parser.add_argument("input", help="JSONL file with one {\"query\": ...} per line")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=16, help="questions in flight at once")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.input, args.output, args.concurrency))
@@ -0,0 +1,103 @@
+# Benchmark: recall vs latency of quantized collections on a local Qdrant
+#
+# Loads the same vectors into three throwaway collections (no quantization,
+# scalar int8, binary) and runs the same queries against each, with a few
+# oversampling factors, with and without rescoring. Recall@k is measured
+# against an exact (brute-force) search on the full-precision collection.
+#
+# Vectors come from an existing collection (--source), or are synthetic.
+#
+# Run with: python bench_quantization.py [--source resume-collection] [--count 20000]
+
+import argparse
+import os
+import statistics
+import time
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient, models
+from quantization import quantization_config, vectors_config
+
+load_dotenv()
+
+client = QdrantClient(host=os.getenv("QDRANT_HOST", "localhost"), port=int(os.getenv("QDRANT_PORT", "6333")))
+
+KINDS = ["none", "scalar", "binary"]
+OVERSAMPLING = [1.0, 2.0, 4.0]
+# RAM per vector for the HNSW search, as a fraction of float32
+RAM_RATIO = {"none": 1, "scalar": 1 / 4, "binary": 1 / 32}
+
+def source_vectors(collection_name: str, count: int) -> np.ndarray:
+    vectors = []
+    offset = None
+    while len(vectors) < count:
+        records, offset = client.scroll(collection_name, limit=min(1024, count - len(vectors)), offset=offset, with_vectors=True)
+        vectors.extend(record.vector for record in records)
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+def synthetic_vectors(count: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    # Clustered like real embeddings: topic centers plus noise
+    centers = rng.normal(size=(max(1, count // 200), dim))
+    vectors = centers[rng.integers(len(centers), size=count)] + rng.normal(scale=0.6, size=(count, dim))
+    return vectors.astype(np.float32)
+
+def load_collection(name: str, kind: str, vectors: np.ndarray):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(name, vectors_config=vectors_config(vectors.shape[1], kind), quantization_config=quantization_config(kind))
+    for start in range(0, len(vectors), 512):
+        batch = vectors[start:start + 512]
+        client.upsert(name, points=models.Batch(ids=list(range(start, start + len(batch))), vectors=batch.tolist()), wait=True)
+    # Wait until the HNSW index (and quantized copy) is built, so latency is measured on the final layout
+    while client.get_collection(name).status != models.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+def search(name: str, queries: np.ndarray, k: int, params: models.SearchParams):
+    ids, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        points = client.query_points(name, query=query.tolist(), limit=k, search_params=params).points
+        latencies.append((time.perf_counter() - started) * 1000)
+        ids.append({point.id for point in points})
+    return ids, latencies
+
+def main(args):
+    rng = np.random.default_rng(0)
+    vectors = source_vectors(args.source, args.count) if args.source else synthetic_vectors(args.count, args.dim, rng)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + rng.normal(scale=0.05 * np.abs(queries).mean(), size=queries.shape).astype(np.float32)
+    print(f"📚 {len(vectors)} vectors of {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    for kind in KINDS:
+        load_collection(f"bench-quantization-{kind}", kind, vectors)
+
+    truth, _ = search("bench-quantization-none", queries, args.k, models.SearchParams(exact=True))
+
+    print(f"{'quantization':<13}{'oversampling':>13}{'rescore':>9}{'RAM':>7}{'recall':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for kind in KINDS:
+        settings = [(None, None)] if kind == "none" else [(o, r) for o in OVERSAMPLING for r in (True, False)]
+        for oversampling, rescore in settings:
+            params = None
+            if kind != "none":
+                params = models.SearchParams(quantization=models.QuantizationSearchParams(rescore=rescore, oversampling=oversampling))
+            found, latencies = search(f"bench-quantization-{kind}", queries, args.k, params)
+            recall = statistics.mean(len(f & t) / len(t) for f, t in zip(found, truth))
+            cuts = statistics.quantiles(latencies, n=100)
+            print(
+                f"{kind:<13}{oversampling or '-':>13}{'-' if rescore is None else str(rescore):>9}"
+                f"{RAM_RATIO[kind]:>7.0%}{recall:>9.3f}{cuts[49]:>9.2f}{cuts[98]:>9.2f}"
+            )
+
+    for kind in KINDS:
+        client.delete_collection(f"bench-quantization-{kind}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs latency of scalar/binary quantization")
+    parser.add_argument("--source", help="copy vectors from this collection instead of generating them")
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=3072, help="dimensions of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    main(parser.parse_args())
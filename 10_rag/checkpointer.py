@@ -0,0 +1,131 @@
+# Durable, bounded checkpointers for LangGraph graphs
+#
+# Kept identical to 09_iterative_workflows/checkpointer.py: a fix here must land there too.
+#
+# Every completed node of a run is checkpointed, so a crashed or timed-out
+# run can be resumed by its thread id from the last completed node instead of
+# paying for every LLM call again.
+#
+# The stores are LangGraph's own savers (langgraph-checkpoint-sqlite/-redis);
+# this module only keeps them bounded:
+#   CHECKPOINTER=sqlite  local file (CHECKPOINT_PATH); only the newest CHECKPOINT_KEEP
+#                        checkpoints of a thread are kept, and threads idle for more
+#                        than CHECKPOINT_MAX_AGE seconds are dropped on open
+#   CHECKPOINTER=redis   shared Redis (REDIS_URL); only the latest checkpoint of a thread
+#                        is kept, with a TTL of CHECKPOINT_MAX_AGE
+#   CHECKPOINTER=none    no checkpointing
+#
+# Both savers are synchronous; their async methods run the sync ones in a worker
+# thread, so a compiled graph works with invoke and ainvoke alike.
+
+import asyncio
+import os
+import sqlite3
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHECKPOINTER = os.getenv("CHECKPOINTER", "none")
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", ".checkpoints.sqlite")
+CHECKPOINT_KEEP = int(os.getenv("CHECKPOINT_KEEP", 20))
+CHECKPOINT_MAX_AGE = int(os.getenv("CHECKPOINT_MAX_AGE", 7 * 24 * 3600))
+# 06_checkpointing/docker-compose.yml publishes its Redis on 6380
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6380/0")
+
+def thread_config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+class ThreadedAsync:
+    """Async saver methods that run the sync ones in a worker thread."""
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit))):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+# -------------------------
+# Backends
+# -------------------------
+def sqlite_checkpointer(path: str = CHECKPOINT_PATH, keep: int = CHECKPOINT_KEEP, max_age: int = CHECKPOINT_MAX_AGE):
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    class PrunedSqliteSaver(ThreadedAsync, SqliteSaver):
+        def setup(self):
+            if self.is_setup:
+                return
+            super().setup()
+            self.conn.execute("CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, updated_at REAL)")
+            # Threads nobody touched for max_age are dropped with all their checkpoints
+            expired = [row[0] for row in self.conn.execute(
+                "SELECT thread_id FROM thread_activity WHERE updated_at < ?", (time.time() - max_age,)
+            )]
+            for table in ("checkpoints", "writes", "thread_activity"):
+                self.conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(thread_id,) for thread_id in expired])
+            self.conn.commit()
+
+        def put(self, config, checkpoint, metadata, new_versions):
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            thread_id, checkpoint_ns = str(saved["configurable"]["thread_id"]), saved["configurable"]["checkpoint_ns"]
+            with self.cursor() as cur:
+                cur.execute("INSERT OR REPLACE INTO thread_activity VALUES (?, ?)", (thread_id, time.time()))
+                # Checkpoint ids sort by time: everything below the keep-th newest goes, with its writes
+                cur.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                    (thread_id, checkpoint_ns, keep - 1),
+                )
+                if oldest_kept := cur.fetchone():
+                    for table in ("checkpoints", "writes"):
+                        cur.execute(
+                            f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                            (thread_id, checkpoint_ns, oldest_kept[0]),
+                        )
+            return saved
+
+        def delete_thread(self, thread_id):
+            super().delete_thread(thread_id)
+            with self.cursor() as cur:
+                cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    # The saver serializes access with its own lock, so the connection can be shared across threads
+    return PrunedSqliteSaver(sqlite3.connect(path, check_same_thread=False))
+
+def redis_checkpointer(url: str = REDIS_URL, max_age: int = CHECKPOINT_MAX_AGE):
+    from langgraph.checkpoint.redis import ShallowRedisSaver
+
+    class ThreadedShallowRedisSaver(ThreadedAsync, ShallowRedisSaver):
+        pass
+
+    # Resuming only needs a thread's latest checkpoint, so the shallow saver keeps just that
+    saver = ThreadedShallowRedisSaver(url, ttl={"default_ttl": max_age / 60, "refresh_on_read": True})
+    saver.setup()
+    return saver
+
+def make_checkpointer(kind: str = CHECKPOINTER):
+    if kind == "sqlite":
+        return sqlite_checkpointer()
+    if kind == "redis":
+        return redis_checkpointer()
+    return None
+
+def resume_input(graph, config: dict, fresh_input):
+    """Returns None (= continue from the last completed node) if the thread has an unfinished run, else `fresh_input`."""
+    if graph.checkpointer is None:
+        return fresh_input
+    return None if graph.get_state(config).next else fresh_input
+
+async def aresume_input(graph, config: dict, fresh_input):
+    if graph.checkpointer is None:
+        return fresh_input
+    return None if (await graph.aget_state(config)).next else fresh_input
@@ -0,0 +1,89 @@
+# Context packing for the generate node
+#
+# The ingest splitter overlaps neighbouring chunks by 80 characters, so the
+# top-k hits often repeat text. Before the hits go into the prompt they are:
+#   1. merged, when one chunk's tail is the next chunk's head (same source),
+#   2. dropped, when they are near-duplicates of a hit already kept,
+#   3. packed in rank order until the token budget is full.
+
+import os
+import tiktoken
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Max tokens of retrieved context put into the prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+# Word-shingle Jaccard similarity above which a hit counts as a near-duplicate
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", 0.8))
+
+# Gemini's tokenizer isn't public; cl100k is a close enough estimate for budgeting
+encoding = tiktoken.get_encoding("cl100k_base")
+
+# Overlaps shorter than this are coincidence, longer than this aren't splitter overlap
+MIN_OVERLAP = 20
+MAX_OVERLAP = 200
+
+def overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    for size in range(min(len(left), len(right), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+def merge_overlapping(hits):
+    # hits: [(source, text)] in rank order; a merged hit keeps the better rank
+    hits = list(hits)
+    merged = True
+    while merged:
+        merged = False
+        for i, (source, left) in enumerate(hits):
+            for j, (other_source, right) in enumerate(hits):
+                if i == j or source != other_source:
+                    continue
+                size = overlap_length(left, right)
+                if size:
+                    hits[min(i, j)] = (source, left + right[size:])
+                    del hits[max(i, j)]
+                    merged = True
+                    break
+            if merged:
+                break
+    return hits
+
+def shingles(text: str, size: int = 3) -> set:
+    words = text.lower().split()
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+def is_near_duplicate(text: str, kept: list[tuple[str, set]]) -> bool:
+    text_shingles = shingles(text)
+    for kept_text, kept_shingles in kept:
+        if text in kept_text:
+            return True
+        union = text_shingles | kept_shingles
+        if union and len(text_shingles & kept_shingles) / len(union) >= DUPLICATE_THRESHOLD:
+            return True
+    return False
+
+def pack_context(docs, token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    hits = merge_overlapping((doc.metadata.get("source"), doc.page_content) for doc in docs)
+
+    kept = []
+    parts = []
+    used = 0
+    for _, text in hits:
+        if is_near_duplicate(text, kept):
+            continue
+        kept.append((text, shingles(text)))
+
+        tokens = encoding.encode(text)
+        remaining = token_budget - used
+        if len(tokens) > remaining:
+            # Fill what is left of the budget with the head of this hit, then stop
+            if remaining > 0:
+                parts.append(encoding.decode(tokens[:remaining]))
+            break
+        parts.append(text)
+        used += len(tokens) + 1  # + the separator
+
+    return "\n\n".join(parts)
@@ -0,0 +1,125 @@
+# Two-tier cache in front of an embeddings model
+#
+# Tier 1 is an in-process LRU, tier 2 a SQLite file on disk that survives
+# restarts. Vectors are keyed by model name + text hash (and whether it was
+# embedded as a query or a document, since Gemini embeds those differently)
+# and stored as compact float32 blobs. Only texts missing from both tiers
+# reach the network.
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+import xxhash
+from langchain_core.embeddings import Embeddings
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 4096))
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, model: str, path: str = EMBEDDING_CACHE_PATH, lru_size: int = EMBEDDING_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.model = model
+        self.lru = OrderedDict()
+        self.lru_size = lru_size
+        self.lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL)"
+        )
+
+    def key(self, kind: str, text: str) -> str:
+        return f"{self.model}:{kind}:{xxhash.xxh3_128_hexdigest(text.encode())}"
+
+    def remember(self, key: str, vector: np.ndarray):
+        self.lru[key] = vector
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def lookup(self, kind: str, texts: list[str]):
+        """Returns each text's cache key, the vectors already cached, and the {key: text} pairs still to embed."""
+        keys = [self.key(kind, text) for text in texts]
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.lru:
+                    self.lru.move_to_end(key)
+                    found[key] = self.lru[key]
+                    self.counters["memory_hits"] += 1
+
+            on_disk = [key for key in dict.fromkeys(keys) if key not in found]
+            for start in range(0, len(on_disk), 500):
+                batch = on_disk[start:start + 500]
+                rows = self.db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self.remember(key, vector)
+                    self.counters["disk_hits"] += 1
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        self.counters["misses"] += len(missing)
+        return keys, found, missing
+
+    def store(self, found: dict, missing: dict, vectors: list[list[float]]):
+        rows = []
+        with self.lock:
+            for key, vector in zip(missing, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                found[key] = vector
+                self.remember(key, vector)
+                rows.append((key, vector.tobytes()))
+            self.db.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self.db.commit()
+
+    def embed_documents(self, texts: list[str], **kwargs) -> list[list[float]]:
+        keys, found, missing = self.lookup("document", texts)
+        if missing:
+            self.store(found, missing, self.embeddings.embed_documents(list(missing.values()), **kwargs))
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str, **kwargs) -> list[float]:
+        keys, found, missing = self.lookup("query", [text])
+        if missing:
+            self.store(found, missing, [self.embeddings.embed_query(text, **kwargs)])
+        return found[keys[0]].tolist()
+
+    async def aembed_documents(self, texts: list[str], **kwargs) -> list[list[float]]:
+        keys, found, missing = self.lookup("document", texts)
+        if missing:
+            self.store(found, missing, await self.embeddings.aembed_documents(list(missing.values()), **kwargs))
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str, **kwargs) -> list[float]:
+        keys, found, missing = self.lookup("query", [text])
+        if missing:
+            self.store(found, missing, [await self.embeddings.aembed_query(text, **kwargs)])
+        return found[keys[0]].tolist()
+
+    async def aembed_queries(self, texts: list[str], **kwargs) -> list[list[float]]:
+        """Embeds many queries in batched requests and caches them, so later embed_query calls for them are hits.
+
+        The wrapped model must embed documents as queries when asked to via kwargs
+        (e.g. task_type="RETRIEVAL_QUERY" for Gemini).
+        """
+        keys, found, missing = self.lookup("query", texts)
+        if missing:
+            self.store(found, missing, await self.embeddings.aembed_documents(list(missing.values()), **kwargs))
+        return [found[key].tolist() for key in keys]
+
+    def stats(self) -> dict:
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        total = hits + self.counters["misses"]
+        return {**self.counters, "hit_rate": round(hits / total, 3) if total else 0.0}
@@ -1,12 +1,20 @@
 import os
+import uuid
 from dotenv import load_dotenv
-from langgraph.graph import StateGraph
+from langgraph.graph import StateGraph, END
 from langchain_google_genai import (
     ChatGoogleGenerativeAI,
     GoogleGenerativeAIEmbeddings,
 )
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
+from embedding_cache import CachedEmbeddings
+from local_index import LocalVectorStore, LOCAL_INDEX_DIR
+from context_packing import pack_context
+from answer_cache import SemanticAnswerCache
+from checkpointer import make_checkpointer, thread_config
+from quantization import search_params
+from tenancy import COLLECTION_NAME, DEFAULT_TENANT, tenant_filter, local_filter
 
 load_dotenv()
 
@@ -22,28 +30,42 @@ llm = ChatGoogleGenerativeAI(
 # -------------------------
 # Embeddings (same as ingest)
 # -------------------------
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/gemini-embedding-001",
-    google_api_key=os.getenv("GOOGLE_API_KEY"),
+# Cached, so a repeated query is answered by retriever.invoke without an embedding call
+embedding_model = "models/gemini-embedding-001"
+embeddings = CachedEmbeddings(
+    GoogleGenerativeAIEmbeddings(
+        model=embedding_model,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+    ),
+    model=embedding_model,
 )
 
 # -------------------------
-# Qdrant connection
+# Vector store: Qdrant, or the embedded local index ("local")
 # -------------------------
+vector_backend = os.getenv("VECTOR_BACKEND", "qdrant")
 qdrant_host = os.getenv("QDRANT_HOST", "localhost")
 qdrant_port = os.getenv("QDRANT_PORT", "6333")
-collection_name = "resume-collection"
-
-client = QdrantClient(
-    host=qdrant_host,
-    port=int(qdrant_port),
-)
-
-vector_store = QdrantVectorStore(
-    client=client,
-    collection_name=collection_name,
-    embedding=embeddings,
-)
+# One collection shared by all tenants; every search is filtered to the asking tenant
+collection_name = COLLECTION_NAME
+
+if vector_backend == "local":
+    # Exported with `python local_index.py`; searched in-process, no network round trip
+    vector_store = LocalVectorStore(
+        path=os.path.join(LOCAL_INDEX_DIR, collection_name),
+        embedding=embeddings,
+    )
+else:
+    client = QdrantClient(
+        host=qdrant_host,
+        port=int(qdrant_port),
+    )
+
+    vector_store = QdrantVectorStore(
+        client=client,
+        collection_name=collection_name,
+        embedding=embeddings,
+    )
 
 # This turns the vector store into a retriever that will return the top 5 most similar documents
 # based on the embedding similarity for a given query.
@@ -51,23 +73,57 @@ retriever = vector_store.as_retriever(
     search_kwargs={"k": 5}
 )
 
+# -------------------------
+# Semantic answer cache (optional)
+# -------------------------
+# Near-identical questions are answered from memory, skipping retrieve + generate.
+# One cache per tenant, emptied automatically when ingest.py re-indexes that tenant.
+use_answer_cache = os.getenv("ANSWER_CACHE", "off") == "on"
+answer_caches = {}
+
+def answer_cache_for(tenant_id: str) -> SemanticAnswerCache:
+    if tenant_id not in answer_caches:
+        answer_caches[tenant_id] = SemanticAnswerCache(f"{collection_name}.{tenant_id}")
+    return answer_caches[tenant_id]
+
+def retrieval_kwargs(tenant_id: str) -> dict:
+    if vector_backend == "local":
+        # Applied inside the probed IVF clusters when the local index is partitioned
+        return {"filter": local_filter(tenant_id)}
+    # With a quantized collection: oversample, then rescore with the full-precision vectors
+    return {"filter": tenant_filter(tenant_id), "search_params": search_params()}
+
 # -------------------------
 # Graph State
 # -------------------------
 class State(dict):
     query: str
+    tenant_id: str
     docs: list
     answer: str
+    cached: bool
 
 # -------------------------
 # Nodes
 # -------------------------
+def check_cache(state: State):
+    # The query embedding is cached, so retrieve reuses it without another API call
+    tenant_id = state.get("tenant_id", DEFAULT_TENANT)
+    answer = answer_cache_for(tenant_id).lookup(embeddings.embed_query(state["query"]))
+    if answer is None:
+        return {"cached": False}
+    return {"answer": answer, "cached": True}
+
+def route_cache(state: State):
+    return END if state["cached"] else "retrieve"
+
 def retrieve(state: State):
-    docs = retriever.invoke(state["query"])
+    docs = retriever.invoke(state["query"], **retrieval_kwargs(state.get("tenant_id", DEFAULT_TENANT)))
     return {"docs": docs}
 
 def generate(state: State):
-    context = "\n\n".join(doc.page_content for doc in state["docs"])
+    # Overlapping hits are merged, near-duplicates dropped, and the rest packed into a token budget
+    context = pack_context(state["docs"])
 
     prompt = f"""
 Answer the question using ONLY the resume content below.
@@ -81,7 +137,14 @@ Question:
 {state['query']}
 """
 
-    response = llm.invoke(prompt)
+    # Streamed, so app.stream(..., stream_mode="messages") hands out tokens as they arrive
+    response = None
+    for chunk in llm.stream(prompt):
+        response = chunk if response is None else response + chunk
+
+    if use_answer_cache:
+        tenant_id = state.get("tenant_id", DEFAULT_TENANT)
+        answer_cache_for(tenant_id).store(embeddings.embed_query(state["query"]), response.content)
     return {"answer": response.content}
 
 # -------------------------
@@ -93,6 +156,27 @@ graph.add_node("retrieve", retrieve)
 graph.add_node("generate", generate)
 
 graph.add_edge("retrieve", "generate")
-graph.set_entry_point("retrieve")
 
-app = graph.compile()
\ No newline at end of file
+if use_answer_cache:
+    graph.add_node("cache", check_cache)
+    graph.add_conditional_edges("cache", route_cache, ["retrieve", END])
+    graph.set_entry_point("cache")
+else:
+    graph.set_entry_point("retrieve")
+
+# With CHECKPOINTER=sqlite|redis a run interrupted after retrieve resumes at generate
+app = graph.compile(checkpointer=make_checkpointer())
+
+def run_config(thread_id: str | None = None) -> dict:
+    # A thread id is required once a checkpointer is configured; a fresh one per run by default
+    return thread_config(thread_id or uuid.uuid4().hex)
+
+# Stream modes used by query.py and main.py: "messages" yields answer tokens
+# from the generate node, "values" yields the state after every node
+STREAM_MODES = ["messages", "values"]
+
+def answer_token(chunk, metadata) -> str:
+    """Returns the text of a "messages" stream event if it is part of the answer."""
+    if metadata.get("langgraph_node") != "generate":
+        return ""
+    return chunk.text
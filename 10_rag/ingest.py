@@ -1,30 +1,51 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, models
 from pypdf import PdfReader
+from itertools import islice
+import argparse
+import asyncio
 import os
+import uuid
+import xxhash
 from dotenv import load_dotenv
+from embedding_cache import CachedEmbeddings
+from answer_cache import bump_collection_version
+from quantization import quantization_config, vectors_config
+from tenancy import COLLECTION_NAME, DEFAULT_TENANT, HNSW_CONFIG, PAYLOAD_INDEXES, tenant_filter
 
 load_dotenv()
 
-reader = PdfReader("Frontend.pdf")
-# This code reads all the pages from the PDF using pypdf's PdfReader,
-# extracts the text from each page, and combines everything into a single string,
-# with each page's text separated by a newline.
-text = "\n".join([page.extract_text() for page in reader.pages])
+parser = argparse.ArgumentParser(description="Index a PDF into the shared collection")
+parser.add_argument("pdf_path", nargs="?", default="Frontend.pdf")
+parser.add_argument("--tenant", default=DEFAULT_TENANT, help="tenant the document belongs to")
+parser.add_argument("--document", help="document id within the tenant (default: the PDF path)")
+args = parser.parse_args()
+
+pdf_path = args.pdf_path
+tenant_id = args.tenant
+document_id = args.document or pdf_path
+
+# Chunks sent to the embedding API per request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+# Batches being embedded/upserted at the same time. This also bounds memory:
+# at most INGEST_CONCURRENCY batches of chunks are held at once.
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", 4))
 
 # Chunk resume
 splitter = RecursiveCharacterTextSplitter(
   chunk_size=400,
   chunk_overlap=80
 )
-chunks = splitter.split_text(text)
 
-# Embeddings
-embeddings = GoogleGenerativeAIEmbeddings(
-  model="models/gemini-embedding-001",
-  google_api_key=os.getenv("GOOGLE_API_KEY")
+# Embeddings (cached on disk, so text embedded on an earlier run is never re-embedded)
+embedding_model = "models/gemini-embedding-001"
+embeddings = CachedEmbeddings(
+  GoogleGenerativeAIEmbeddings(
+    model=embedding_model,
+    google_api_key=os.getenv("GOOGLE_API_KEY")
+  ),
+  model=embedding_model
 )
 
 # Qdrant
@@ -32,25 +53,173 @@ embeddings = GoogleGenerativeAIEmbeddings(
 qdrant_host = os.getenv("QDRANT_HOST", "localhost")
 qdrant_port = os.getenv("QDRANT_PORT", "6333")
 
-client = QdrantClient(host=qdrant_host, port=int(qdrant_port))
-
-# Collection name (equivalent to Pinecone index)
-collection_name = "resume-collection"
-
-# Note: We'll let LangChain handle the collection creation with the correct dimensions
-# Delete collection if it exists to ensure clean start
-try:
-    client.delete_collection(collection_name)
-    print(f"Deleted existing collection '{collection_name}'")
-except Exception:
-    print(f"Collection '{collection_name}' doesn't exist yet")
-
-# Use LangChain's Qdrant integration to add documents
-vector_store = QdrantVectorStore.from_texts(
-    texts=chunks,
-    embedding=embeddings,
-    collection_name=collection_name,
-    url=f"http://{qdrant_host}:{qdrant_port}",
-)
+client = AsyncQdrantClient(host=qdrant_host, port=int(qdrant_port))
+
+# One collection shared by all tenants
+collection_name = COLLECTION_NAME
+
+# -------------------------
+# Streaming stages
+# -------------------------
+def extract_pages(path):
+    # Only one page's text is held in memory at a time
+    reader = PdfReader(path)
+    for number, page in enumerate(reader.pages):
+        yield number, page.extract_text() or ""
+
+def chunk_pages(pages):
+    # The last chunk of every page is carried into the next one,
+    # so chunks still flow across page breaks like they did on the joined text
+    carry, carry_page = "", 0
+    for number, text in pages:
+        start_page = carry_page if carry else number
+        chunks = splitter.split_text(f"{carry}\n{text}" if carry else text)
+        for i, chunk in enumerate(chunks):
+            page = start_page if i == 0 else number
+            if i < len(chunks) - 1:
+                yield chunk, page
+            else:
+                carry, carry_page = chunk, page
+    if carry:
+        yield carry, carry_page
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+# -------------------------
+# Content hashing
+# -------------------------
+def content_hash(chunk: str) -> str:
+    return xxhash.xxh3_128_hexdigest(chunk.encode())
+
+def chunk_id(chunk_hash: str) -> str:
+    # Deterministic point id per (tenant, document, chunk content):
+    # re-ingesting an unchanged chunk maps to the point that already exists
+    return str(uuid.UUID(xxhash.xxh3_128_hexdigest(f"{tenant_id}\0{document_id}\0{chunk_hash}".encode())))
+
+# -------------------------
+# Embed + upsert
+# -------------------------
+collection_lock = asyncio.Lock()
+collection_ready = False
+
+async def create_payload_indexes():
+    for field, schema in PAYLOAD_INDEXES.items():
+        await client.create_payload_index(collection_name, field, field_schema=schema)
+
+async def ensure_collection(vector_size: int):
+    # The vector size is only known once the first batch is embedded
+    global collection_ready
+    async with collection_lock:
+        if not collection_ready:
+            await client.create_collection(
+                collection_name,
+                vectors_config=vectors_config(vector_size),
+                hnsw_config=HNSW_CONFIG,
+                quantization_config=quantization_config(),
+            )
+            await create_payload_indexes()
+            collection_ready = True
+
+async def existing_points():
+    # point id -> page for everything already indexed from this document (payload only, no vectors)
+    points = {}
+    offset = None
+    while True:
+        records, offset = await client.scroll(
+            collection_name,
+            scroll_filter=tenant_filter(tenant_id, document_id),
+            with_payload=["metadata"],
+            limit=1024,
+            offset=offset,
+        )
+        for record in records:
+            points[str(record.id)] = record.payload["metadata"].get("page")
+        if offset is None:
+            return points
+
+async def ingest_batch(batch, existing, seen):
+    fresh, moved = [], []
+    for chunk, page in batch:
+        chunk_hash = content_hash(chunk)
+        point_id = chunk_id(chunk_hash)
+        if point_id in seen:
+            continue  # same text repeated within the document
+        seen.add(point_id)
+        metadata = {
+            "tenant_id": tenant_id,
+            "document_id": document_id,
+            "source": pdf_path,
+            "page": page,
+            "content_hash": chunk_hash,
+        }
+        if point_id not in existing:
+            fresh.append((point_id, chunk, metadata))
+        elif existing[point_id] != page:
+            moved.append((point_id, metadata))
+
+    # Unchanged text that only shifted pages gets its payload fixed, without re-embedding
+    if moved:
+        await client.batch_update_points(collection_name, update_operations=[
+            models.SetPayloadOperation(set_payload=models.SetPayload(payload={"metadata": metadata}, points=[point_id]))
+            for point_id, metadata in moved
+        ])
+
+    if not fresh:
+        return 0
+    vectors = await embeddings.aembed_documents([chunk for _, chunk, _ in fresh], batch_size=EMBED_BATCH_SIZE)
+    await ensure_collection(len(vectors[0]))
+
+    # Same payload layout as QdrantVectorStore, so graph.py's retriever reads these points as-is
+    points = [
+        models.PointStruct(id=point_id, vector=vector, payload={"page_content": chunk, "metadata": metadata})
+        for (point_id, chunk, metadata), vector in zip(fresh, vectors)
+    ]
+    await client.upsert(collection_name, points=points)
+    return len(points)
+
+async def main():
+    # The collection is updated in place (never dropped), so it stays queryable during re-ingestion
+    global collection_ready
+    existing = {}
+    if await client.collection_exists(collection_name):
+        collection_ready = True
+        await create_payload_indexes()
+        existing = await existing_points()
+        print(f"Collection '{collection_name}' has {len(existing)} chunks of '{document_id}' for tenant '{tenant_id}'")
+    else:
+        print(f"Collection '{collection_name}' doesn't exist yet")
+
+    batches = batched(chunk_pages(extract_pages(pdf_path)), EMBED_BATCH_SIZE)
+    pending = set()
+    seen = set()
+    embedded = 0
+    while True:
+        # PDF parsing runs in a thread so in-flight embed/upsert calls keep progressing
+        batch = await asyncio.to_thread(next, batches, None)
+        if batch is None:
+            break
+        if len(pending) >= INGEST_CONCURRENCY:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            embedded += sum(task.result() for task in done)
+            print(f"📦 {embedded} new chunks embedded")
+        pending.add(asyncio.create_task(ingest_batch(batch, existing, seen)))
+
+    if pending:
+        embedded += sum(await asyncio.gather(*pending))
+
+    # Only once everything new is in, drop chunks that are no longer in the document
+    stale = [point_id for point_id in existing if point_id not in seen]
+    if stale:
+        await client.delete(collection_name, points_selector=models.PointIdsList(points=stale))
+    await client.close()
+
+    # Answers cached by graph.py were generated from the old contents
+    bump_collection_version(f"{collection_name}.{tenant_id}")
+
+    print(f"✅ Resume indexed successfully ({embedded} embedded, {len(seen) - embedded} unchanged, {len(stale)} removed)")
+    print(f"🗃️  Embedding cache: {embeddings.stats()}")
 
-print("✅ Resume indexed successfully")
\ No newline at end of file
+asyncio.run(main())
@@ -0,0 +1,270 @@
+# Embedded, in-process vector index for small collections
+#
+# Vectors live in a flat float32/float16 file that is memory-mapped read-only,
+# so opening an index does not copy it into memory, and top-k is scored with
+# simsimd's SIMD dot-product kernels. Vectors are L2-normalized on write, so
+# the dot product is the cosine similarity, like the Qdrant collections use.
+#
+# Search is exact by default. For larger collections an IVF-style index can
+# be built: vectors are clustered with k-means and stored grouped by cluster,
+# and a query only scores the rows of its `n_probe` closest clusters.
+#
+# LocalVectorStore is a LangChain VectorStore, so `as_retriever()` gives the
+# same retriever interface graph.py uses with Qdrant. A `filter` of exact
+# metadata matches (e.g. {"tenant_id": "acme"}) restricts a search to the
+# matching rows; on a partitioned index only the matching rows of the probed
+# clusters are scored, and more clusters are probed until k rows match.
+#
+# Export an existing Qdrant collection (no re-embedding):
+#   python local_index.py [--partitions 64] [--float16]
+
+import argparse
+import json
+import os
+import uuid
+from pathlib import Path
+import numpy as np
+import simsimd
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from answer_cache import bump_collection_version
+
+load_dotenv()
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+# Clusters scored per query when the index is partitioned
+LOCAL_INDEX_PROBES = int(os.getenv("LOCAL_INDEX_PROBES", 4))
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def dot_scores(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    return np.asarray(simsimd.cdist(query[None, :], vectors, metric="dot"))[0]
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, path, embedding, dtype: str = "float32", n_probe: int = LOCAL_INDEX_PROBES):
+        self.path = Path(path)
+        self.embedding = embedding
+        self.n_probe = n_probe
+        self.manifest = {"dim": None, "dtype": dtype, "count": 0}
+        self.load()
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    # -------------------------
+    # Files
+    # -------------------------
+    def load(self):
+        manifest = self.path / "manifest.json"
+        if manifest.exists():
+            self.manifest = json.loads(manifest.read_text())
+        self.map_vectors()
+
+        self.payloads = []
+        if (self.path / "payloads.jsonl").exists():
+            with open(self.path / "payloads.jsonl") as f:
+                self.payloads = [json.loads(line) for line in f]
+
+        self.filter_masks = {}
+        self.centroids = self.offsets = None
+        if (self.path / "centroids.npy").exists():
+            self.centroids = np.load(self.path / "centroids.npy")
+            self.offsets = np.load(self.path / "offsets.npy")
+
+    def map_vectors(self):
+        count, dim = self.manifest["count"], self.manifest["dim"]
+        self.vectors = None
+        if count:
+            # Read-only memory map: pages are loaded lazily by the OS, nothing is copied up front
+            self.vectors = np.memmap(self.path / "vectors.bin", dtype=self.manifest["dtype"], mode="r", shape=(count, dim))
+
+    def save_manifest(self):
+        (self.path / "manifest.json").write_text(json.dumps(self.manifest))
+
+    def drop_partitions(self):
+        # Appended rows are not in any cluster, so the IVF index has to be rebuilt
+        for name in ("centroids.npy", "offsets.npy"):
+            (self.path / name).unlink(missing_ok=True)
+        self.centroids = self.offsets = None
+
+    def add_vectors(self, vectors, payloads):
+        vectors = normalize(np.asarray(vectors, dtype=np.float32)).astype(self.manifest["dtype"])
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / "vectors.bin", "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self.path / "payloads.jsonl", "a") as f:
+            for payload in payloads:
+                f.write(json.dumps(payload) + "\n")
+
+        self.payloads.extend(payloads)
+        self.filter_masks = {}
+        self.manifest["dim"] = vectors.shape[1]
+        self.manifest["count"] += len(vectors)
+        self.drop_partitions()
+        self.save_manifest()
+        self.map_vectors()
+
+    def build_partitions(self, n_partitions: int, iterations: int = 10, seed: int = 0):
+        """Clusters the vectors with k-means and rewrites the files grouped by cluster."""
+        vectors = self.vectors
+        n_partitions = min(n_partitions, len(vectors))
+        rng = np.random.default_rng(seed)
+        centroids = np.asarray(vectors[rng.choice(len(vectors), n_partitions, replace=False)], dtype=np.float32)
+        for _ in range(iterations):
+            assignments = np.asarray(simsimd.cdist(vectors, centroids.astype(vectors.dtype), metric="dot")).argmax(axis=1)
+            for p in range(n_partitions):
+                members = vectors[assignments == p]
+                if len(members):
+                    centroids[p] = np.asarray(members, dtype=np.float32).mean(axis=0)
+            centroids = normalize(centroids)
+        assignments = np.asarray(simsimd.cdist(vectors, centroids.astype(vectors.dtype), metric="dot")).argmax(axis=1)
+
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[order], np.arange(n_partitions + 1))
+
+        # Write the regrouped copy next to the old files, then swap them in
+        with open(self.path / "vectors.bin.tmp", "wb") as f:
+            for start in range(0, len(order), 4096):
+                f.write(np.asarray(vectors[order[start:start + 4096]]).tobytes())
+        with open(self.path / "payloads.jsonl.tmp", "w") as f:
+            for row in order:
+                f.write(json.dumps(self.payloads[row]) + "\n")
+        self.vectors = None
+        os.replace(self.path / "vectors.bin.tmp", self.path / "vectors.bin")
+        os.replace(self.path / "payloads.jsonl.tmp", self.path / "payloads.jsonl")
+        np.save(self.path / "centroids.npy", centroids.astype(self.manifest["dtype"]))
+        np.save(self.path / "offsets.npy", offsets)
+        self.load()
+
+    def matching_mask(self, filter: dict) -> np.ndarray:
+        # Mask of the rows whose metadata matches every field; cached per filter until the index changes
+        key = tuple(sorted(filter.items()))
+        if key not in self.filter_masks:
+            self.filter_masks[key] = np.array([
+                all(payload["metadata"].get(field) == value for field, value in filter.items())
+                for payload in self.payloads
+            ], dtype=bool)
+        return self.filter_masks[key]
+
+    def probed_matching_rows(self, probes, matches, n_probe: int, k: int):
+        # Matching rows of the probed clusters; further clusters (closest first) are
+        # probed until at least k rows match, so a small tenant still gets k results
+        rows, found = [], 0
+        for probe, p in enumerate(probes):
+            if probe >= n_probe and found >= k:
+                break
+            cluster = np.arange(self.offsets[p], self.offsets[p + 1])
+            rows.append(cluster[matches[cluster]])
+            found += len(rows[-1])
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    # -------------------------
+    # VectorStore interface
+    # -------------------------
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self.add_vectors(
+            self.embedding.embed_documents(texts),
+            [{"id": id, "page_content": text, "metadata": metadata} for id, text, metadata in zip(ids, texts, metadatas)],
+        )
+        return ids
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        if self.vectors is None:
+            return []
+        query_vector = normalize(np.asarray([self.embedding.embed_query(query)], dtype=np.float32))[0]
+        query_vector = query_vector.astype(self.manifest["dtype"])
+
+        matches = self.matching_mask(kwargs["filter"]) if kwargs.get("filter") else None
+        n_probe = kwargs.get("n_probe", self.n_probe)
+        if self.centroids is None and matches is None:
+            rows = np.arange(len(self.vectors))
+            scores = dot_scores(query_vector, self.vectors)
+        elif matches is not None:
+            # Exact over the filter's rows, or only those inside the closest clusters when partitioned
+            if self.centroids is None:
+                rows = np.flatnonzero(matches)
+            else:
+                rows = self.probed_matching_rows(np.argsort(-dot_scores(query_vector, self.centroids)), matches, n_probe, k)
+            scores = dot_scores(query_vector, self.vectors[rows]) if len(rows) else np.empty(0)
+        else:
+            # Score only the rows of the closest clusters; each cluster is one contiguous slice of the map
+            probes = np.argsort(-dot_scores(query_vector, self.centroids))[:n_probe]
+            rows = np.concatenate([np.arange(self.offsets[p], self.offsets[p + 1]) for p in probes])
+            scores = np.concatenate([
+                dot_scores(query_vector, self.vectors[self.offsets[p]:self.offsets[p + 1]])
+                for p in probes if self.offsets[p + 1] > self.offsets[p]
+            ] or [np.empty(0)])
+
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            payload = self.payloads[rows[i]]
+            document = Document(page_content=payload["page_content"], metadata=payload["metadata"], id=payload["id"])
+            results.append((document, float(scores[i])))
+        return results
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        return [document for document, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None, path=None, **kwargs):
+        store = cls(path or Path(LOCAL_INDEX_DIR) / "collection", embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+# -------------------------
+# Export from Qdrant
+# -------------------------
+def export_collection(collection_name: str, dtype: str, partitions: int):
+    from qdrant_client import QdrantClient
+
+    client = QdrantClient(host=os.getenv("QDRANT_HOST", "localhost"), port=int(os.getenv("QDRANT_PORT", "6333")))
+    path = Path(LOCAL_INDEX_DIR) / collection_name
+    for name in ("manifest.json", "vectors.bin", "payloads.jsonl", "centroids.npy", "offsets.npy"):
+        (path / name).unlink(missing_ok=True)
+    store = LocalVectorStore(path, embedding=None, dtype=dtype)
+
+    tenants = set()
+    offset = None
+    while True:
+        records, offset = client.scroll(collection_name, limit=1024, offset=offset, with_payload=True, with_vectors=True)
+        tenants.update((record.payload.get("metadata") or {}).get("tenant_id") for record in records)
+        if records:
+            store.add_vectors(
+                [record.vector for record in records],
+                [{"id": str(record.id), "page_content": record.payload["page_content"], "metadata": record.payload.get("metadata") or {}} for record in records],
+            )
+        if offset is None:
+            break
+
+    if partitions:
+        store.build_partitions(partitions)
+    for tenant_id in tenants - {None}:
+        bump_collection_version(f"{collection_name}.{tenant_id}")
+    print(f"✅ Exported {store.manifest['count']} vectors from '{collection_name}' to {path}")
+
+if __name__ == "__main__":
+    from tenancy import COLLECTION_NAME
+
+    parser = argparse.ArgumentParser(description="Export a Qdrant collection to a local memory-mapped index")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--float16", action="store_true", help="store vectors as float16 (half the size)")
+    parser.add_argument("--partitions", type=int, default=0, help="build an IVF index with this many clusters")
+    args = parser.parse_args()
+
+    export_collection(args.collection, "float16" if args.float16 else "float32", args.partitions)
@@ -0,0 +1,38 @@
+# HTTP front end for the RAG graph, streaming the answer as Server-Sent Events
+#
+# Run with: uvicorn main:app
+
+import json
+from fastapi import FastAPI, Query
+from fastapi.responses import StreamingResponse
+from graph import app as graph, run_config, STREAM_MODES, answer_token
+from checkpointer import aresume_input
+from tenancy import DEFAULT_TENANT
+
+app = FastAPI()
+
+@app.get("/ask")
+async def ask(
+    query: str = Query(..., description="The question to answer from the resume"),
+    tenant: str = Query(DEFAULT_TENANT, description="Tenant whose documents are searched"),
+    thread_id: str | None = Query(None, description="Resume this run if it was interrupted (needs CHECKPOINTER)"),
+):
+    async def events():
+        streamed = False
+        result = {}
+        config = run_config(thread_id)
+        state = await aresume_input(graph, config, {"query": query, "tenant_id": tenant})
+        async for mode, data in graph.astream(state, config, stream_mode=STREAM_MODES):
+            if mode == "messages":
+                token = answer_token(*data)
+                if token:
+                    streamed = True
+                    yield f"event: token\ndata: {json.dumps(token)}\n\n"
+            else:
+                result = data
+
+        if not streamed:
+            yield f"event: token\ndata: {json.dumps(result.get('answer', ''))}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -0,0 +1,40 @@
+# Vector quantization for the Qdrant collection
+#
+# gemini-embedding-001 vectors are 3072 float32s (12 KB per chunk). With
+# quantization Qdrant keeps a compressed copy in RAM for the HNSW search and
+# moves the full-precision vectors to disk:
+#   scalar: int8 per dimension, 4x smaller
+#   binary: 1 bit per dimension, 32x smaller (works well for high-dim embeddings)
+# At query time `oversampling` x k candidates are fetched with the quantized
+# vectors and rescored with the original ones, which recovers most of the recall.
+
+import os
+from dotenv import load_dotenv
+from qdrant_client import models
+
+load_dotenv()
+
+# "none", "scalar" or "binary"; only applied when a collection is created
+QUANTIZATION = os.getenv("QUANTIZATION", "none")
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QUANTIZATION_OVERSAMPLING", 2.0))
+QUANTIZATION_RESCORE = os.getenv("QUANTIZATION_RESCORE", "on") == "on"
+
+def quantization_config(kind: str = QUANTIZATION):
+    if kind == "scalar":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8, quantile=0.99, always_ram=True,
+        ))
+    if kind == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+def vectors_config(size: int, kind: str = QUANTIZATION) -> models.VectorParams:
+    # Full-precision vectors only go to disk when a quantized copy serves the search
+    return models.VectorParams(size=size, distance=models.Distance.COSINE, on_disk=kind != "none")
+
+def search_params(kind: str = QUANTIZATION, oversampling: float = QUANTIZATION_OVERSAMPLING, rescore: bool = QUANTIZATION_RESCORE):
+    if kind == "none":
+        return None
+    return models.SearchParams(quantization=models.QuantizationSearchParams(
+        rescore=rescore, oversampling=oversampling,
+    ))
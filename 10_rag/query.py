@@ -1,4 +1,5 @@
-from graph import app
+from graph import app, embeddings, answer_caches, use_answer_cache, run_config, STREAM_MODES, answer_token
+from tenancy import DEFAULT_TENANT
 
 print("💬 Ask questions about your resume (type 'exit' to quit)\n")
 
@@ -7,8 +8,25 @@ while True:
     if query.lower() in ["exit", "quit"]:
         break
 
-    result = app.invoke({"query": query})
-
     print("\n🤖 Answer:")
-    print(result["answer"])
+    streamed = False
+    result = {}
+    for mode, data in app.stream({"query": query, "tenant_id": DEFAULT_TENANT}, run_config(), stream_mode=STREAM_MODES):
+        if mode == "messages":
+            token = answer_token(*data)
+            if token:
+                print(token, end="", flush=True)
+                streamed = True
+        else:
+            result = data
+
+    # Nothing streamed (e.g. no LLM call was made): print the final answer instead
+    if not streamed:
+        print(result.get("answer", ""), end="")
+    print()
     print("-" * 50)
+
+print(f"🗃️  Embedding cache: {embeddings.stats()}")
+if use_answer_cache:
+    for tenant_id, answer_cache in answer_caches.items():
+        print(f"🧠 Answer cache ({tenant_id}): {answer_cache.stats()}")
@@ -0,0 +1,69 @@
+# Multi-tenancy for the shared collection
+#
+# Every tenant's documents live in one collection instead of one collection
+# each. Points carry `tenant_id` and `document_id` in their metadata, both
+# keyword payload indexes, and every search is filtered to one tenant. The
+# tenant index is marked `is_tenant`, so Qdrant stores each tenant's points
+# together, and the collection builds per-tenant HNSW graphs (payload_m)
+# instead of one global graph (m=0).
+#
+# Deleting a tenant is a single filtered delete:
+#   python tenancy.py delete <tenant_id> [--document <document_id>]
+#   python tenancy.py count <tenant_id>
+
+import argparse
+import os
+from dotenv import load_dotenv
+from qdrant_client import models
+
+load_dotenv()
+
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "resume-collection")
+DEFAULT_TENANT = os.getenv("TENANT_ID", "default")
+
+TENANT_FIELD = "metadata.tenant_id"
+DOCUMENT_FIELD = "metadata.document_id"
+
+# Per-tenant HNSW graphs only; unfiltered search over all tenants is never needed
+HNSW_CONFIG = models.HnswConfigDiff(payload_m=16, m=0)
+
+PAYLOAD_INDEXES = {
+    TENANT_FIELD: models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+    DOCUMENT_FIELD: models.PayloadSchemaType.KEYWORD,
+}
+
+def tenant_filter(tenant_id: str, document_id: str | None = None) -> models.Filter:
+    conditions = [models.FieldCondition(key=TENANT_FIELD, match=models.MatchValue(value=tenant_id))]
+    if document_id is not None:
+        conditions.append(models.FieldCondition(key=DOCUMENT_FIELD, match=models.MatchValue(value=document_id)))
+    return models.Filter(must=conditions)
+
+def local_filter(tenant_id: str) -> dict:
+    # Same restriction for LocalVectorStore, which matches metadata fields exactly
+    return {"tenant_id": tenant_id}
+
+# -------------------------
+# CLI
+# -------------------------
+if __name__ == "__main__":
+    from qdrant_client import QdrantClient
+
+    parser = argparse.ArgumentParser(description="Manage tenants in the shared collection")
+    parser.add_argument("action", choices=["delete", "count"])
+    parser.add_argument("tenant")
+    parser.add_argument("--document", help="only this document of the tenant")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    args = parser.parse_args()
+
+    client = QdrantClient(host=os.getenv("QDRANT_HOST", "localhost"), port=int(os.getenv("QDRANT_PORT", "6333")))
+    selector = tenant_filter(args.tenant, args.document)
+    count = client.count(args.collection, count_filter=selector, exact=True).count
+
+    if args.action == "delete":
+        # Served by the tenant payload index: no scan over other tenants' points
+        client.delete(args.collection, points_selector=models.FilterSelector(filter=selector))
+        from answer_cache import bump_collection_version
+        bump_collection_version(f"{args.collection}.{args.tenant}")
+        print(f"🗑️  Deleted {count} points of tenant '{args.tenant}'")
+    else:
+        print(f"📊 Tenant '{args.tenant}' has {count} points")